@@ -1,9 +1,17 @@
 import app.cfg as cfg
+import app.isp as isp
+import app.imagen as imagen
+import app.dispositivos as dispositivos
+import app.tiempos as tiempos
+import app.log as log
+import app.progreso as progreso
+from app.imagen import FlashImage, load_hex, load_hex_lines
 import machine
 import time
 import utime
 import uos
 import sys
+import ubinascii
 from app.comun import *
 
 
@@ -15,247 +23,666 @@ RESET_PIN = 7
 
 l_graba = 0
 
-# --- ISP Timing ---
-SCK_DELAY_US = 1    #50   # ~100 kHz SCK
-
 BYTES_PER_RECORD = 16 # Bytes por línea para el archivo HEX (Intel HEX)
+dump_signature = None # Firma del último chip leído con dump_flash()
+dump_fuses = None     # (fuse bajo, fuse alto, lock bits) de ese chip
+
+# La geometría y los tiempos de cada chip están en el registro de
+# app/dispositivos.py; el motor usa la entrada que corresponde a la firma leída.
+device = dispositivos.ATTINY13  # Chip detectado en la última sesión
+
+# --- Initialize ISP port ---
+# El transporte (bit-bang, SPI hardware/software o simulado) se elige en config.json.
+# Con "sockets" se definen varios zócalos que comparten SCK/MOSI y tienen su
+# propio RESET y MISO, p. ej. [{"reset": 7, "miso": 5}, {"reset": 3, "miso": 1}]
+isp_config = cfg.carga_config().get("isp", {})
+SOCKETS = isp_config.get("sockets") or [{"reset": RESET_PIN, "miso": MISO_PIN}]
+
+# ------------------------
+# RDY/BSY polling
+# ------------------------
 
-# ATtiny13 parameters - CORRECTED VALUES
-ATTINY13_SIGNATURE = [0x1E, 0x90, 0x07] # 30, 144, 7
-FLASH_SIZE = 1024  # 1K bytes total
-ATTINY13_PAGE_SIZE = 32   # ATtiny13 has 16 words = 32 bytes per page
-ATTINY13_WORDS_PER_PAGE = 16  # 16 words per page
-ATTINY13_TOTAL_PAGES = 32     # 32 pages total (32 * 32 = 1024 bytes)
-
-# --- ATtiny13 Fuse Bit Settings for 9.6 MHz internal clock ---
-# SAFE FUSE SETTINGS - CAREFULLY VERIFIED TO AVOID BRICKING THE CHIP!
-
-# Low Fuse: 0x7A for 9.6 MHz (default factory is 0x6A for 1.2MHz)
-# Bit 7: CKDIV8  = 0 (disable clock division by 8 - gives full 9.6MHz)
-# Bit 6: CKOUT   = 1 (disable clock output on PB4)
-# Bit 5-4: SUT   = 01 (14CK + 64ms startup time - safe default)
-# Bit 3-0: CKSEL = 1010 (internal RC oscillator - 9.6MHz when CKDIV8=0)
-ATTINY13_LOW_FUSE_9_6MHZ = 0x7A
-
-# High Fuse: 0xFF (SAFE DEFAULT - keeps all dangerous bits disabled)
-# Bit 7: RSTDISBL = 1 (RESET PIN ENABLED - CRITICAL FOR ISP!)
-# Bit 6: BODLEVEL = 1 (brown-out detection disabled)
-# Bit 5: BODEN    = 1 (brown-out detection disabled)
-# Bit 4: -        = 1 (reserved, keep as 1)
-# Bit 3: -        = 1 (reserved, keep as 1)
-# Bit 2: -        = 1 (reserved, keep as 1)
-# Bit 1: SPIEN    = 1 (SPI PROGRAMMING ENABLED - CRITICAL FOR ISP!)
-# Bit 0: -        = 1 (reserved, keep as 1)
-ATTINY13_HIGH_FUSE = 0xFF
-
-# Factory default fuses for reference and recovery
-ATTINY13_FACTORY_LOW_FUSE = 0x6A   # 1.2MHz (9.6MHz/8)
-ATTINY13_FACTORY_HIGH_FUSE = 0xFF  # All safe defaults
-
-# --- Initialize Pins ---
-sck   = machine.Pin(SCK_PIN, machine.Pin.OUT)
-mosi  = machine.Pin(MOSI_PIN, machine.Pin.OUT)
-miso  = machine.Pin(MISO_PIN, machine.Pin.IN, machine.Pin.PULL_UP)
-reset = machine.Pin(RESET_PIN, machine.Pin.OUT)
+# Las esperas son los tWD del chip detectado (device.t_flash, t_erase,
+# t_fuse). Se usan como límite del sondeo y como espera fija si el chip no
+# responde a "Poll RDY/BSY".
+
+POLL_RDY = isp_config.get("poll_rdy", True)
+
+# Tiempo de ocupado medido por operación:
+# [cuenta, total_us, min_us, max_us, histograma en tramos de 1 ms (el último es ">=")]
+BUSY_HIST_SLOTS = 8
+busy_stats = {}
+
+def _record_busy(op, us):
+    st = busy_stats.get(op)
+    if st is None:
+        st = [0, 0, us, us] + [0] * BUSY_HIST_SLOTS
+        busy_stats[op] = st
+    st[0] += 1
+    st[1] += us
+    if us < st[2]:
+        st[2] = us
+    if us > st[3]:
+        st[3] = us
+    st[4 + min(us // 1000, BUSY_HIST_SLOTS - 1)] += 1
+
+def print_busy_stats():
+    """Muestra la distribución de tiempos de ocupado medidos."""
+    for op, st in busy_stats.items():
+        log.info("Busy %s: n=%d avg=%dus min=%dus max=%dus hist(ms)=%s", op, st[0], st[1] // st[0], st[2], st[3], st[4:])
 
 # ------------------------
-# Low-level helpers
+# Native engine self-check
 # ------------------------
 
-def transfer_byte(byte):
-    read_val = 0
-    for i in range(8):
-        mosi.value((byte >> (7 - i)) & 0x01)
-        time.sleep_us(SCK_DELAY_US) # Necesario para SCK LOW time
-        sck.value(1) # Ascendente
-        read_val = (read_val << 1) | miso.value()
-        time.sleep_us(SCK_DELAY_US) # Necesario para SCK HIGH time
-        sck.value(0) # Descendente
-    return read_val
-
-def send_cmd(a, b, c, d):
-    r1 = transfer_byte(a)
-    r2 = transfer_byte(b)
-    r3 = transfer_byte(c)
-    r4 = transfer_byte(d)
-    #print(f"CMD [{a:02X} {b:02X} {c:02X} {d:02X}] -> RESP [{r1:02X} {r2:02X} {r3:02X} {r4:02X}]")
-    return r3, r4
-
-def send_cmd_r3(a, b, c, d):
-    return send_cmd(a, b, c, d)[0]
-
-def send_cmd_r4(a, b, c, d):
-    return send_cmd(a, b, c, d)[1]
+# Flujo de solo lectura (firma, fuses y lock bits) para comparar motores
+_SELF_CHECK_TX = bytes([
+    0x30, 0x00, 0x00, 0x00,  0x30, 0x00, 0x01, 0x00,  0x30, 0x00, 0x02, 0x00,
+    0x50, 0x00, 0x00, 0x00,  0x58, 0x08, 0x00, 0x00,  0x58, 0x00, 0x00, 0x00,
+])
+
+# ------------------------
+# ISP clock negotiation
+# ------------------------
+
+# Se arranca siempre a SCK_SLOW (seguro para un chip a 1.2 MHz de fábrica) y se
+# sube duplicando hasta SCK_MAX mientras la firma y los fuses se lean igual.
+SCK_SLOW = isp_config.get("baudrate", isp.SPI_BAUDRATE)
+SCK_MAX = isp_config.get("sck_max", 2000000)
+SPEED_CHECKS = 3  # Lecturas correctas seguidas exigidas a cada velocidad
+# Porcentaje que se baja del último SCK que pasó cuando el siguiente ha fallado:
+# la comprobación solo lee, y grabar cerca del límite del chip no es seguro
+SPEED_MARGIN = isp_config.get("sck_margin", 25)
+AUTO_SPEED = isp_config.get("auto_speed", True)
+
+# Comandos que identifican al chip: firma (3 bytes), fuse bajo y fuse alto
+_ID_CMDS = ((0x30, 0x00, 0x00), (0x30, 0x00, 0x01), (0x30, 0x00, 0x02),
+            (0x50, 0x00, 0x00), (0x58, 0x08, 0x00))
+
+# Pulso con el que un zócalo terminado sale del modo programación sin llegar a
+# arrancar (ver IspPort.finish()); basta con unos pocos ciclos del chip
+RESET_PULSE_US = 20
+
+# Lectura en bloque: se encadenan READ_CHUNK comandos 0x20/0x28 en un solo
+# transfer() sobre buffers reutilizados y se recoge el 4º byte de cada uno.
+READ_CHUNK = 64
+
+# ------------------------
+# ISP port
+# ------------------------
+
+class IspPort:
+    """
+    Puerto ISP con uno o varios zócalos. SCK y MOSI son comunes y cada zócalo
+    tiene su RESET y su MISO: cada comando se envía una sola vez para todos los
+    chips y las respuestas se separan por zócalo. Un zócalo que falla se saca
+    del modo programación (RESET alto) y el resto sigue; el resultado de cada
+    uno queda en results.
+    """
+
+    def __init__(self, transporte, resets, page_size=dispositivos.MAX_PAGE_SIZE):
+        self.transporte = transporte
+        self.resets = resets
+        self.n = len(resets)
+        self.active = [False] * self.n
+        self.results = [None] * self.n
+        self.poll_ok = True          # Se desactiva si el chip no sale nunca de ocupado
+        self.engine_checked = False
+        # Buffers reutilizados para no reservar memoria en cada comando
+        self._cmd_tx = bytearray(4)
+        self._cmd_rx = [bytearray(4) for _ in resets]
+        self._page_tx = bytearray(page_size * 4)
+        self._page_rx = [bytearray(page_size * 4) for _ in resets]
+        self._read_tx = bytearray(READ_CHUNK * 4)
+        self._read_rx = [bytearray(READ_CHUNK * 4) for _ in resets]
+        self.page_size = page_size
+
+    # --- Zócalos ---
+
+    def label(self, i):
+        """Prefijo para los mensajes de un zócalo (vacío con uno solo)."""
+        return f"[{i}] " if self.n > 1 else ""
+
+    def active_sockets(self):
+        return [i for i in range(self.n) if self.active[i]]
+
+    def any_active(self):
+        return True in self.active
+
+    def all_ok(self):
+        for r in self.results:
+            if r != "programmed" and r != "up to date":
+                return False
+        return True
+
+    def finish(self, i, result):
+        """
+        Da por terminado el zócalo i y guarda su resultado. Un pulso de RESET lo
+        saca del modo programación, pero el chip se queda en reset hasta end():
+        si arrancase su firmware podría mover SCK/MOSI, que comparten los demás.
+        """
+        self.active[i] = False
+        self.results[i] = result
+        r = self.resets[i]
+        r.value(1)
+        time.sleep_us(RESET_PULSE_US)
+        r.value(0)
+
+    def drop(self, i, reason):
+        log.error("Socket %d failed: %s", i, reason)
+        self.finish(i, reason)
+
+    # --- Transferencias ---
+
+    def transfer(self, tx, rxs, n):
+        """Envía los n primeros bytes de tx; rxs[i] recibe lo devuelto por el zócalo i."""
+        if n == len(tx):
+            self.transporte.transfer(tx, *rxs)
+        else:
+            self.transporte.transfer(memoryview(tx)[:n], *[memoryview(rx)[:n] for rx in rxs])
+
+    def cmd(self, a, b, c, d):
+        """Envía una instrucción de 4 bytes y devuelve la respuesta de cada zócalo."""
+        tx = self._cmd_tx
+        tx[0] = a
+        tx[1] = b
+        tx[2] = c
+        tx[3] = d
+        self.transporte.transfer(tx, *self._cmd_rx)
+        return self._cmd_rx
+
+    def cmd_r4(self, a, b, c, d):
+        return [rx[3] for rx in self.cmd(a, b, c, d)]
+
+    # --- Entrada y salida del modo programación ---
+
+    def init(self):
+        self.transporte.idle()
+        for r in self.resets:
+            r.value(1)
+        time.sleep_ms(10)
+
+    def start(self):
+        """Entra en modo programación en todos los zócalos. Devuelve True si responde alguno."""
+        self.poll_ok = True
+        self.results = [None] * self.n
+        self.active = [True] * self.n
+        self.transporte.set_speed(SCK_SLOW)
+        for r in self.resets:
+            r.value(0)
+        time.sleep_ms(20)  # Give chip time to enter reset
+        r3s = self._enable()
+        for i in range(self.n):
+            if r3s[i] == 0x53:
+                print(f"{self.label(i)}Programming mode entered successfully.")
+            else:
+                print(f"{self.label(i)}Failed to enter programming mode (got 0x{r3s[i]:02X}).")
+                self.finish(i, "no chip")
+        if not self.any_active():
+            return False
+        if AUTO_SPEED:
+            self.negotiate_speed()
+        else:
+            # SCK_SLOW solo para el Programming Enable; se graba a la velocidad configurada
+            self.transporte.set_speed(None)
+        return self.any_active()
+
+    def _enable(self):
+        """
+        Programming Enable en todos los zócalos. La primera vez que responde un
+        chip se hace también la autocomprobación del motor nativo, tanto al
+        grabar como al sondear (start() y probe()). Devuelve el r3 de cada uno.
+        """
+        r3s = [rx[2] for rx in self.cmd(0xAC, 0x53, 0x00, 0x00)]
+        if not self.engine_checked and self.n == 1 and hasattr(self.transporte, "reference"):
+            r3s[0] = self._check_engine(r3s[0])
+        return r3s
+
+    def pulse_reset(self, sockets=None):
+        """
+        Pulso positivo en RESET de los zócalos dados (todos por defecto). Es lo
+        único que devuelve la sincronía a un chip que ha perdido los bits, p. ej.
+        por un SCK demasiado rápido; después hay que repetir el Programming Enable.
+        """
+        resets = self.resets if sockets is None else [self.resets[i] for i in sockets]
+        for r in resets:
+            r.value(1)
+        time.sleep_ms(1)
+        for r in resets:
+            r.value(0)
+        time.sleep_ms(20)  # Give chip time to enter reset
+
+    def probe(self):
+        """
+        Sondeo silencioso para detectar chips: pulso de RESET, Programming
+        Enable a SCK_SLOW y lectura de la firma. Devuelve la firma de cada
+        zócalo (None si no responde) y los deja fuera del modo programación.
+        """
+        self.transporte.set_speed(SCK_SLOW)
+        self.pulse_reset()
+        sigs = [None] * self.n
+        r3s = self._enable()
+        for addr in range(3):
+            rxs = self.cmd(0x30, 0x00, addr, 0x00)
+            for i in range(self.n):
+                if r3s[i] == 0x53:
+                    if sigs[i] is None:
+                        sigs[i] = []
+                    sigs[i].append(rxs[i][3])
+        for r in self.resets:
+            r.value(1)
+        return sigs
+
+    def end(self):
+        """Sale del modo programación: todos los zócalos se liberan a la vez."""
+        for i in range(self.n):
+            self.resets[i].value(1)
+            self.active[i] = False
+            if self.results[i] is None:
+                self.results[i] = "failed"
+        time.sleep_ms(1)
+
+    def _check_engine(self, r3):
+        """
+        Autocomprobación del motor nativo contra el bit-bang de referencia, una vez
+        por arranque. Recibe el r3 del Programming Enable y devuelve el r3 válido
+        con el motor que quede seleccionado.
+        """
+        native = self.transporte
+        ref = native.reference
+        if r3 == 0x53:
+            if isp.self_check(native, ref, _SELF_CHECK_TX):
+                print("Native ISP engine self-check passed.")
+                self.engine_checked = True
+                return r3
+        else:
+            # ¿Falla el motor nativo o no hay chip? Lo decide el de referencia
+            self.pulse_reset([0])
+            self.transporte = ref
+            r3 = self.cmd(0xAC, 0x53, 0x00, 0x00)[0][2]
+            self.transporte = native
+            if r3 != 0x53:
+                return r3  # No hay chip: se comprobará con el siguiente
+        print("Native ISP engine failed self-check, using portable bit-bang.")
+        self.engine_checked = True
+        self.transporte = ref
+        # El motor nativo ha podido dejar al chip desincronizado: nuevo RESET
+        self.pulse_reset([0])
+        return self.cmd(0xAC, 0x53, 0x00, 0x00)[0][2]
+
+    # --- Velocidad de SCK ---
+
+    def read_ids(self):
+        """Firma + fuse bajo + fuse alto de cada zócalo."""
+        ids = [[] for _ in range(self.n)]
+        for a, b, c in _ID_CMDS:
+            rxs = self.cmd(a, b, c, 0x00)
+            for i in range(self.n):
+                ids[i].append(rxs[i][3])
+        return ids
+
+    def _speed_fails(self, hz, ids):
+        """Zócalos activos que no leen bien firma y fuses a hz (lista vacía si ninguno)."""
+        self.transporte.set_speed(hz)
+        for _ in range(SPEED_CHECKS):
+            current = self.read_ids()
+            fails = [i for i in self.active_sockets() if current[i] != ids[i]]
+            if fails:
+                return fails
+        return []
+
+    def _resync(self, hz):
+        """
+        Tras un paso de velocidad fallido los chips han perdido la sincronía:
+        pulso de RESET, vuelta a hz y nuevo Programming Enable. Los zócalos que
+        no devuelven el eco 0x53 se descartan. Devuelve True si queda alguno.
+        """
+        sockets = self.active_sockets()
+        self.transporte.set_speed(hz)
+        self.pulse_reset(sockets)
+        rxs = self.cmd(0xAC, 0x53, 0x00, 0x00)
+        for i in sockets:
+            if rxs[i][2] != 0x53:
+                self.drop(i, "lost sync")
+        return self.any_active()
+
+    def negotiate_speed(self):
+        """
+        Elige el SCK más rápido que lee bien la firma y los fuses de todos los
+        chips activos, con SPEED_MARGIN de margen si el límite es el del chip.
+        El resultado se guarda en config por firma+fuses, así el siguiente chip
+        igual arranca directamente a esa velocidad tras una sola comprobación.
+        En gang vale el más lento de los zócalos, y solo se guarda para el suyo. Devuelve el SCK elegido, o
+        None si ningún chip se recupera de un paso fallido.
+        """
+        ids = self.read_ids()
+        sockets = self.active_sockets()
+        keys = ["".join([f"{x:02X}" for x in ids[i]]) for i in range(self.n)]
+        names = ",".join([keys[i] for i in sockets])
+        cache = isp_config.setdefault("speed_cache", {})
+        cached = [cache.get(keys[i]) for i in sockets]
+        if None not in cached:
+            if not self._speed_fails(min(cached), ids):
+                print(f"ISP clock {min(cached)} Hz (cached for {names})")
+                return min(cached)
+            if not self._resync(SCK_SLOW):
+                return None
+
+        best = SCK_SLOW
+        hz = SCK_SLOW * 2
+        limit = []
+        while hz <= SCK_MAX:
+            limit = self._speed_fails(hz, ids)
+            if limit:
+                break
+            best = hz
+            hz *= 2
+        if limit:
+            # El paso a hz ha fallado: se deja margen bajo el último que pasó
+            best = max(SCK_SLOW, best * (100 - SPEED_MARGIN) // 100)
+            if not self._resync(best):
+                return None
+        else:
+            limit = sockets  # Todos llegan a SCK_MAX
+            self.transporte.set_speed(best)
+        print(f"ISP clock {best} Hz (negotiated for {names})")
+
+        # Solo se guarda para los chips que han marcado el límite: en gang, uno
+        # lento no debe dejar a los demás tipos a su velocidad para siempre
+        config = cfg.carga_config()
+        saved = config.setdefault("isp", {}).setdefault("speed_cache", {})
+        for i in limit:
+            cache[keys[i]] = best
+            saved[keys[i]] = best
+        cfg.guarda_config(config)
+        return best
+
+    # --- Espera de fin de escritura ---
+
+    def wait_ready(self, op, max_us):
+        """
+        Espera a que todos los chips activos terminen la escritura en curso
+        sondeando RDY/BSY (0xF0). max_us (el tWD del chip) es el límite del
+        sondeo; si no responden se vuelve a la espera fija de max_us para el
+        resto de la sesión.
+        """
+        if not (POLL_RDY and self.poll_ok):
+            time.sleep_us(max_us)
+            return
+        t0 = utime.ticks_us()
+        limit_us = max_us
+        while True:
+            rxs = self.cmd(0xF0, 0x00, 0x00, 0x00)
+            busy = False
+            for i in range(self.n):
+                if self.active[i] and rxs[i][3] & 0x01:
+                    busy = True
+                    break
+            elapsed = utime.ticks_diff(utime.ticks_us(), t0)
+            if not busy:
+                _record_busy(op, elapsed)
+                return
+            if elapsed > limit_us:
+                # Ya se ha esperado el peor caso: la operación ha terminado igualmente
+                log.warning("RDY/BSY polling not supported, falling back to fixed delays.")
+                self.poll_ok = False
+                return
+
+    # --- Flash ---
+
+    def load_page(self, data_bytes):
+        """
+        Carga en el buffer de página de los chips los bytes de data_bytes
+        distintos de 0xFF (tras el borrado ya valen eso) con una sola
+        transferencia. Solo se comprueba el eco del primer y último comando;
+        los zócalos que pierden la sincronía se descartan.
+        Devuelve True si queda algún zócalo activo.
+        """
+        tx = self._page_tx
+        n = 0
+        for i in range(min(len(data_bytes), self.page_size)):
+            value = data_bytes[i]
+            if value != 0xFF:
+                tx[n] = 0x48 if i & 0x01 else 0x40
+                tx[n + 1] = 0x00
+                tx[n + 2] = i >> 1
+                tx[n + 3] = value
+                n += 4
+        return self._load(tx, n)
+
+    def _load(self, tx, n):
+        if n == 0:
+            return self.any_active()
+        rxs = self._page_rx
+        self.transfer(tx, rxs, n)
+        for i in self.active_sockets():
+            rx = rxs[i]
+            if rx[1] != tx[0] or rx[n - 3] != tx[n - 4]:
+                self.drop(i, "page load")
+        return self.any_active()
+
+    def load_eeprom_page(self, data_bytes, offsets):
+        """
+        Carga en el buffer de página de EEPROM (0xC1) solo los bytes de
+        data_bytes indicados en offsets: al grabar la página el resto de
+        posiciones no se modifica. Devuelve True si queda algún zócalo activo.
+        """
+        tx = self._page_tx
+        n = 0
+        for k in offsets:
+            tx[n] = 0xC1
+            tx[n + 1] = 0x00
+            tx[n + 2] = k
+            tx[n + 3] = data_bytes[k]
+            n += 4
+        return self._load(tx, n)
+
+    def read_block(self, start, length, intos, eeprom=False):
+        """
+        Lee length bytes de flash (o de EEPROM con eeprom=True) desde la
+        dirección start en una sola pasada para todos los zócalos: intos[i]
+        recibe los del zócalo i (None: se descartan).
+        """
+        dests = [None if b is None else memoryview(b) for b in intos]
+        tx = self._read_tx
+        rxs = self._read_rx
+        done = 0
+        while done < length:
+            n = min(READ_CHUNK, length - done)
+            addr = start + done
+            for k in range(n):
+                j = k * 4
+                if eeprom:
+                    tx[j] = 0xA0
+                    tx[j + 1] = ((addr + k) >> 8) & 0xFF
+                    tx[j + 2] = (addr + k) & 0xFF
+                    continue
+                word_addr = (addr + k) >> 1
+                tx[j] = 0x28 if (addr + k) & 0x01 else 0x20
+                tx[j + 1] = (word_addr >> 8) & 0xFF
+                tx[j + 2] = word_addr & 0xFF
+            self.transfer(tx, rxs, n * 4)
+            # Los slices con paso de memoryview no existen en MicroPython: copia directa
+            for i in range(self.n):
+                if dests[i] is None:
+                    continue
+                rx = rxs[i]
+                out = dests[i][done:done + n]
+                for k in range(n):
+                    out[k] = rx[k * 4 + 3]
+            done += n
+        return intos
+
+
+def crea_puerto(opciones, sockets):
+    transporte = isp.crea_transporte(opciones, SCK_PIN, MOSI_PIN, [s["miso"] for s in sockets])
+    resets = isp.crea_resets(transporte, [s["reset"] for s in sockets])
+    return IspPort(transporte, resets)
+
+port = crea_puerto(isp_config, SOCKETS)
+
+# ------------------------
+# Low-level helpers (zócalo 0 por defecto)
+# ------------------------
+
+def send_cmd(a, b, c, d, socket=0):
+    rx = port.cmd(a, b, c, d)[socket]
+    #print(f"CMD [{a:02X} {b:02X} {c:02X} {d:02X}] -> RESP [{rx[0]:02X} {rx[1]:02X} {rx[2]:02X} {rx[3]:02X}]")
+    return rx[2], rx[3]
+
+def send_cmd_r3(a, b, c, d, socket=0):
+    return send_cmd(a, b, c, d, socket)[0]
+
+def send_cmd_r4(a, b, c, d, socket=0):
+    return send_cmd(a, b, c, d, socket)[1]
+
+def wait_ready(op, max_us):
+    port.wait_ready(op, max_us)
 
 # ------------------------
 # ISP interface
 # ------------------------
 
 def init_isp():
-    sck.value(0)
-    mosi.value(0)
-    reset.value(1)
-    time.sleep_ms(10)
+    port.init()
 
 def start_programming():
-    reset.value(0)
-    time.sleep_ms(20)  # Give chip time to enter reset
-    r3 = send_cmd_r3(0xAC, 0x53, 0x00, 0x00)
-    if r3 == 0x53:
-        print("Programming mode entered successfully.")
-        return True
-    else:
-        print(f"Failed to enter programming mode (got 0x{r3:02X}).")
-        return False
+    return port.start()
+
+def negotiate_speed():
+    return port.negotiate_speed()
 
 def end_programming():
-    reset.value(1)
-    time.sleep_ms(1)
+    port.end()
+
+def chips_present():
+    """Número de zócalos con un chip de firma conocida (ver IspPort.probe())."""
+    n = 0
+    for sig in port.probe():
+        if sig is not None and dispositivos.busca(sig) is not None:
+            n += 1
+    return n
 
 # ------------------------
 # Fuse bit operations
 # ------------------------
 
-def read_low_fuse():
+def read_low_fuse(socket=0):
     """Read low fuse byte"""
-    return send_cmd_r4(0x50, 0x00, 0x00, 0x00)
+    return send_cmd_r4(0x50, 0x00, 0x00, 0x00, socket)
 
-def read_high_fuse():
+def read_high_fuse(socket=0):
     """Read high fuse byte"""
-    return send_cmd_r4(0x58, 0x08, 0x00, 0x00)
+    return send_cmd_r4(0x58, 0x08, 0x00, 0x00, socket)
 
-def read_lock_bits():
+def read_lock_bits(socket=0):
     """Read lock bits"""
-    return send_cmd_r4(0x58, 0x00, 0x00, 0x00)
+    return send_cmd_r4(0x58, 0x00, 0x00, 0x00, socket)
 
 def write_low_fuse(fuse_value):
     """Write low fuse byte"""
     print(f"Writing low fuse: 0x{fuse_value:02X}")
     send_cmd_r4(0xAC, 0xA0, 0x00, fuse_value)
-    time.sleep_ms(50)  # Wait for fuse write to complete
-
-def write_high_fuse(fuse_value):
-    """Write high fuse byte"""
-    print(f"Writing high fuse: 0x{fuse_value:02X}")
-    send_cmd_r4(0xAC, 0xA8, 0x00, fuse_value)
-    time.sleep_ms(50)  # Wait for fuse write to complete
+    wait_ready("fuse", device.t_fuse)  # Wait for fuse write to complete
 
 def program_fuses_for_9_6mhz():
-    """Program fuses for 9.6 MHz internal clock - SAFETY CHECKED"""
-    print("\n=== Programming Fuses for 9.6 MHz Internal Clock ===")
+    """
+    Program fuses for 9.6 MHz internal clock - SAFETY CHECKED.
+    Solo el ATtiny13 tiene un fuse bajo objetivo (device.low_fuse); en el resto
+    de chips únicamente se comprueba que los fuses actuales son seguros.
+    Se hace a la vez en todos los zócalos activos; los que fallan se descartan.
+    """
+    target = device.low_fuse
+    print(f"\n=== Programming Fuses for {device.name} ===")
     print("⚠️  SAFETY: Fuse settings verified to keep RESET and SPI programming enabled!")
 
-    # Read current fuse settings
-    low_fuse = read_low_fuse()
-    high_fuse = read_high_fuse()
-    print(f"Current Low Fuse:  0x{low_fuse:02X}")
-    print(f"Current High Fuse: 0x{high_fuse:02X}")
-
-    # CRITICAL SAFETY CHECK: Never allow dangerous high fuse values!
-    if ATTINY13_HIGH_FUSE != 0xFF:
-        print("❌ SAFETY ERROR: High fuse setting is not 0xFF (safe default)")
-        print("❌ This could disable RESET pin or SPI programming - ABORTING!")
+    # CRITICAL SAFETY CHECK: Never write a low fuse that disables SPI programming!
+    if target is not None and not device.low_ok(target):
+        print(f"❌ SAFETY ERROR: Low fuse 0x{target:02X} would disable SPI programming")
+        print("❌ This would make the chip unprogrammable via ISP - ABORTING!")
         return False
 
     # Additional safety check on the low fuse bits that matter for clock
-    expected_cksel = ATTINY13_LOW_FUSE_9_6MHZ & 0x0F  # Should be 0x0A for internal RC
-    if expected_cksel != 0x0A:
-        print(f"❌ SAFETY WARNING: CKSEL bits are 0x{expected_cksel:X}, expected 0x0A for internal RC")
-        print("❌ This may not be a valid internal RC setting - ABORTING!")
-        return False
+    if device is dispositivos.ATTINY13:
+        expected_cksel = target & 0x0F  # Should be 0x0A for internal RC
+        if expected_cksel != 0x0A:
+            print(f"❌ SAFETY WARNING: CKSEL bits are 0x{expected_cksel:X}, expected 0x0A for internal RC")
+            print("❌ This may not be a valid internal RC setting - ABORTING!")
+            return False
+
+    # Read current fuse settings
+    low_fuses = port.cmd_r4(0x50, 0x00, 0x00, 0x00)
+    high_fuses = port.cmd_r4(0x58, 0x08, 0x00, 0x00)
+    sockets = port.active_sockets()
+    for i in sockets:
+        print(f"{port.label(i)}Current Low Fuse:  0x{low_fuses[i]:02X}")
+        print(f"{port.label(i)}Current High Fuse: 0x{high_fuses[i]:02X}")
+
+    # The high fuse is never changed, only checked against the device's safe mask
+    for i in sockets:
+        high_fuse = high_fuses[i]
+        if not device.high_ok(high_fuse):
+            print(f"❌ {port.label(i)}CRITICAL DANGER: High fuse 0x{high_fuse:02X} disables RESET, SPI programming or enables debugWIRE!")
+            print("❌ This chip can not be safely programmed via ISP - ABORTING!")
+            port.drop(i, "high fuse")
+        else:
+            print(f"{port.label(i)}High fuse 0x{high_fuse:02X} is safe, keeping current value")
 
-    # Write new fuse settings if different
-    if low_fuse != ATTINY13_LOW_FUSE_9_6MHZ:
-        print(f"Setting Low Fuse to 0x{ATTINY13_LOW_FUSE_9_6MHZ:02X} for 9.6 MHz internal clock...")
-        write_low_fuse(ATTINY13_LOW_FUSE_9_6MHZ)
+    # Write new fuse settings if different (una sola escritura para todos los zócalos)
+    sockets = port.active_sockets()
+    if target is None:
+        print(f"Low fuse left unchanged on {device.name}")
+    elif [i for i in sockets if low_fuses[i] != target]:
+        print(f"Setting Low Fuse to 0x{target:02X} for 9.6 MHz internal clock...")
+        write_low_fuse(target)
 
         # Verify the write
-        new_low_fuse = read_low_fuse()
-        if new_low_fuse == ATTINY13_LOW_FUSE_9_6MHZ:
-            print(f"✅ Low fuse successfully set to 0x{new_low_fuse:02X}")
-        else:
-            print(f"❌ Low fuse write failed! Got 0x{new_low_fuse:02X}, expected 0x{ATTINY13_LOW_FUSE_9_6MHZ:02X}")
-            return False
+        new_low_fuses = port.cmd_r4(0x50, 0x00, 0x00, 0x00)
+        for i in sockets:
+            if new_low_fuses[i] == target:
+                print(f"✅ {port.label(i)}Low fuse successfully set to 0x{new_low_fuses[i]:02X}")
+            else:
+                print(f"❌ {port.label(i)}Low fuse write failed! Got 0x{new_low_fuses[i]:02X}, expected 0x{target:02X}")
+                port.drop(i, "low fuse")
     else:
         print("Low fuse already set correctly for 9.6 MHz")
 
-    # For high fuse, we should NOT change it from 0xFF (safe default)
-    if high_fuse != ATTINY13_HIGH_FUSE:
-        print(f"⚠️  Current High Fuse (0x{high_fuse:02X}) differs from safe default (0x{ATTINY13_HIGH_FUSE:02X})")
-        if high_fuse == 0xFE:  # 0xFE would disable RSTDISBL - VERY DANGEROUS!
-            print("❌ CRITICAL DANGER: High fuse 0xFE would disable RESET pin!")
-            print("❌ This would make the chip unprogrammable via ISP - ABORTING!")
-            return False
-        elif high_fuse & 0x02 == 0:  # SPIEN bit cleared - also dangerous
-            print("❌ CRITICAL DANGER: SPIEN bit is disabled!")
-            print("❌ This would make the chip unprogrammable via SPI - ABORTING!")
-            return False
-        else:
-            print("ℹ️  High fuse looks safe, keeping current value rather than changing it")
-    else:
-        print("High fuse already set to safe default (0xFF)")
-
     print("=== Fuse Programming Complete ===\n")
-    return True
-
-def display_fuse_settings():
-    """Display current fuse settings with interpretation"""
-    print("\n=== Current Fuse Settings ===")
-    low_fuse = read_low_fuse()
-    high_fuse = read_high_fuse()
-    lock_bits = read_lock_bits()
+    return port.any_active()
+
+def _print_fuse_bits(value, names, mask, safe):
+    """Un bit por línea con el nombre que le da el registro; marca los críticos para ISP."""
+    for n in range(8):
+        name = names[n]
+        bit = 7 - n
+        if name == "-":
+            continue
+        v = (value >> bit) & 1
+        line = f"  {name:<10} {v} ({'programmed' if v == 0 else 'unprogrammed'})"
+        if mask & (1 << bit):
+            line += " ✅" if v == (safe >> bit) & 1 else " ⚠️  DANGER!"
+        print(line)
+
+def display_fuse_settings(socket=0):
+    """Muestra los fuses del zócalo, interpretados según la entrada de device en el registro."""
+    print(f"\n=== Current Fuse Settings {port.label(socket)}===")
+    low_fuse = read_low_fuse(socket)
+    high_fuse = read_high_fuse(socket)
+    lock_bits = read_lock_bits(socket)
 
     print(f"Low Fuse:  0x{low_fuse:02X}")
     print(f"High Fuse: 0x{high_fuse:02X}")
     print(f"Lock Bits: 0x{lock_bits:02X}")
 
-    # Interpret low fuse bits
-    cksel = low_fuse & 0x0F
-    sut = (low_fuse >> 4) & 0x03
-    ckout = (low_fuse >> 6) & 0x01
-    ckdiv8 = (low_fuse >> 7) & 0x01
-
-    # Interpret high fuse bits (safety-critical!)
-    spien = (high_fuse >> 1) & 0x01
-    rstdisbl = (high_fuse >> 7) & 0x01
-
-    print(f"\nLow Fuse Interpretation:")
-    print(f"  CKSEL[3:0]: 0x{cksel:X} ", end="")
-    if cksel == 0x0A:
-        print("(Internal RC oscillator - 9.6MHz calibrated)")
-    elif cksel == 0x02:
-        print("(Internal RC oscillator - 4.8MHz)")
-    elif cksel >= 0x08 and cksel != 0x0A:
-        print("(External clock/crystal)")
-    else:
-        print("(other/unknown clock source)")
-
-    print(f"  SUT[1:0]:   0x{sut:X} (startup time)")
-    print(f"  CKOUT:      {ckout} ({'clock output enabled on PB4' if ckout == 0 else 'no clock output'})")
-    print(f"  CKDIV8:     {ckdiv8} ({'clock divided by 8' if ckdiv8 == 0 else 'no clock division'})")
-
-    print(f"\nHigh Fuse Interpretation (SAFETY CRITICAL):")
-    print(f"  RSTDISBL:   {rstdisbl} ({'RESET PIN DISABLED - DANGER!' if rstdisbl == 0 else 'RESET pin enabled ✅'})")
-    print(f"  SPIEN:      {spien} ({'SPI programming disabled - DANGER!' if spien == 0 else 'SPI programming enabled ✅'})")
-
-    if cksel == 0x0A and ckdiv8 == 1:
-        expected_freq = "9.6 MHz"
-    elif cksel == 0x0A and ckdiv8 == 0:
-        expected_freq = "1.2 MHz (9.6MHz ÷ 8 - factory default)"
-    elif cksel == 0x02 and ckdiv8 == 1:
-        expected_freq = "4.8 MHz"
-    elif cksel == 0x02 and ckdiv8 == 0:
-        expected_freq = "0.6 MHz (4.8MHz ÷ 8)"
-    else:
-        expected_freq = "unknown"
+    print(f"\nLow Fuse Interpretation ({device.name}):")
+    _print_fuse_bits(low_fuse, device.low_bits, device.low_mask, device.low_safe)
+    print(f"\nHigh Fuse Interpretation ({device.name}):")
+    _print_fuse_bits(high_fuse, device.high_bits, device.high_mask, device.high_safe)
 
-    print(f"  → Expected CPU frequency: {expected_freq}")
-
-    # Safety warnings
-    if rstdisbl == 0:
-        print("⚠️  ⚠️  ⚠️  CRITICAL WARNING: RESET is disabled! Chip may be unrecoverable via ISP!")
-    if spien == 0:
-        print("⚠️  ⚠️  ⚠️  CRITICAL WARNING: SPI programming disabled! Chip may be unrecoverable!")
+    if device.low_fuse is not None and low_fuse != device.low_fuse:
+        print(f"  → Low fuse differs from 0x{device.low_fuse:02X}, will be reprogrammed")
+    if not (device.low_ok(low_fuse) and device.high_ok(high_fuse)):
+        print("⚠️  ⚠️  ⚠️  CRITICAL WARNING: fuses disable ISP access! Chip may be unrecoverable!")
     print("================================\n")
 
 # ------------------------
@@ -265,44 +692,53 @@ def display_fuse_settings():
 def chip_erase():
     print("Performing chip erase...")
     send_cmd_r4(0xAC, 0x80, 0x00, 0x00)
-    time.sleep_ms(100)  # Wait for erase to complete
+    wait_ready("erase", device.t_erase)  # Wait for erase to complete
     print("Chip erase complete.")
 
-def read_signature_bytes():
+def read_signature_bytes(socket=0):
     sig = []
     for addr in [0x00, 0x01, 0x02]:
-        val = send_cmd_r4(0x30, 0x00, addr, 0x00)
+        val = send_cmd_r4(0x30, 0x00, addr, 0x00, socket)
         sig.append(val)
     return sig
 
-def program_flash_page(page_address, data_bytes):
-    """Write a page to ATtiny13 flash. ATtiny13 has 16 words (32 bytes) per page."""
-    global l_graba
-    # Load page buffer - ATtiny13 has 16 words per page
-    
-    print(range(ATTINY13_WORDS_PER_PAGE))
-    
-    for word_index in range(ATTINY13_WORDS_PER_PAGE):
-        
-        byte_index = word_index * 2
-
-        # Get low and high bytes
-        if byte_index < len(data_bytes):
-            low_byte = data_bytes[byte_index]
-        else:
-            low_byte = 0xFF
+def detect_device():
+    """
+    Identifica por su firma el chip de cada zócalo activo y deja su entrada del
+    registro en device. Los zócalos con una firma desconocida, o distinta de la
+    del primero, se descartan. Devuelve la entrada o None si no queda ninguno.
+    """
+    global device
+    found = None
+    for i in port.active_sockets():
+        sig = read_signature_bytes(i)
+        dev = dispositivos.busca(sig)
+        print(f"{port.label(i)}Read signature: {sig} (hex: {[hex(x) for x in sig]}) -> {dev}")
+        if dev is None:
+            print("Error: Unknown chip signature!")
+            port.drop(i, "unknown chip")
+        elif found is None:
+            found = dev
+        elif dev is not found:
+            print(f"Error: {dev.name} mixed with {found.name} in the same batch!")
+            port.drop(i, "wrong chip")
+    if found is not None:
+        device = found
+    return found
+
+# Flujo "Load Program Memory Page" de una página (0x40/0x48 por byte): ver
+# IspPort.load_page(). Las páginas enteras a 0xFF ni se cargan ni se graban.
+
+def load_flash_page(data_bytes):
+    """Carga data_bytes en el buffer de página de todos los zócalos activos."""
+    return port.load_page(data_bytes)
 
-        if byte_index + 1 < len(data_bytes):
-            high_byte = data_bytes[byte_index + 1]
-        else:
-            high_byte = 0xFF
-            
-        #l_graba.value(0)
-        # Load program memory page (low byte)
-        send_cmd_r4(0x40, 0x00, word_index, low_byte)
-        # Load program memory page (high byte)
-        #l_graba.value(1)
-        send_cmd_r4(0x48, 0x00, word_index, high_byte)
+def program_flash_page(page_address, data_bytes):
+    """Write a page to flash (device.page_size bytes, 32 on the ATtiny13)."""
+    # Load page buffer
+    if not load_flash_page(data_bytes):
+        log.error("Page load at 0x%04X lost sync with the chip", page_address)
+        return False
 
     # Write program memory page
     # The page address should be the word address of the page start
@@ -310,379 +746,553 @@ def program_flash_page(page_address, data_bytes):
     high_addr = (page_word_addr >> 8) & 0xFF
     low_addr = page_word_addr & 0xFF
 
-    print(f"Writing page at word address 0x{page_word_addr:04X} (byte addr 0x{page_address:04X})")
+    if log.enabled(log.DEBUG):
+        log.debug("Writing page at word address 0x%04X (byte addr 0x%04X)", page_word_addr, page_address)
     send_cmd_r4(0x4C, high_addr, low_addr, 0x00)
-    time.sleep_ms(50)  # Wait for page write to complete
+    wait_ready("page", device.t_flash)  # Wait for page write to complete
+    return True
 
 def parse_hex_file(hex_content):
-    data = {}
-    for line in hex_content.strip().splitlines():
-        if not line.startswith(':'):
-            continue
-        byte_count = int(line[1:3], 16)
-        addr       = int(line[3:7], 16)
-        record_type= int(line[7:9], 16)
-        if record_type == 0:  # Data record
-            for i in range(byte_count):
-                data[addr + i] = int(line[9 + i*2: 11 + i*2], 16)
-        elif record_type == 1:  # EOF
-            break
-    return data
-
-def read_flash_byte(addr):
-    word_addr = addr >> 1
-    high_low  = addr & 0x01
-    cmd = 0x28 if high_low else 0x20
-    return send_cmd_r4(cmd, (word_addr >> 8) & 0xFF, word_addr & 0xFF, 0x00)
-
-def verify_flash(parsed_data,oled):
-    print("Verifying flash contents...")
+    """Convierte el texto HEX (ya en memoria) en una FlashImage que cabe en cualquier chip del registro."""
+    image = FlashImage(imagen.DEFAULT_SIZE, imagen.DEFAULT_PAGE_SIZE)
+    return load_hex_lines(hex_content.encode().splitlines(), image)
+
+def load_hex_file(filepath):
+    """Carga un archivo .hex en una FlashImage leyéndolo en streaming."""
+    return load_hex(filepath, FlashImage(imagen.DEFAULT_SIZE, imagen.DEFAULT_PAGE_SIZE))
+
+def load_rom(filepath):
+    """
+    Carga una ROM desde su caché binaria si está al día; si no, decodifica
+    el .hex y regenera la caché para la próxima vez. Los volcados .bin/.binz
+    ya son binarios y se cargan directamente.
+    """
+    if imagen.is_dump(filepath):
+        image, info = imagen.load_dump(filepath, FlashImage(imagen.DEFAULT_SIZE, imagen.DEFAULT_PAGE_SIZE))
+        if info is not None:
+            dev = dispositivos.busca(info[0])
+            print(f"Volcado de {dev or [hex(x) for x in info[0]]}: fuses 0x{info[1]:02X}/0x{info[2]:02X}, lock 0x{info[3]:02X}")
+        return image
+    cached = imagen.load_cache(filepath)
+    if cached is not None:
+        print(f"Imagen cargada desde caché: {imagen.cache_path(filepath)}")
+        return cached[0]
+    image = load_hex_file(filepath)
+    try:
+        imagen.save_cache(image, filepath)
+    except OSError as e:
+        print(f"No se pudo guardar la caché: {e}")
+    return image
+
+def record_device(image, filepath):
+    """
+    Tras grabar bien una ROM que aún no tenía firma, guarda en su caché la del
+    chip detectado; a partir de ahí program_flash() avisa si se graba en otro.
+    """
+    if image.signature is not None or imagen.is_dump(filepath):
+        return
+    image.signature = device.signature
+    try:
+        imagen.save_cache(image, filepath)
+    except OSError as e:
+        print(f"No se pudo guardar la caché: {e}")
+
+def read_flash_block(start, length, into=None, socket=0):
+    """Lee length bytes de flash desde la dirección start en into (o en un bytearray nuevo)."""
+    if into is None:
+        into = bytearray(length)
+    intos = [None] * port.n
+    intos[socket] = into
+    port.read_block(start, length, intos)
+    return into
+
+MAX_REPORTED_ERRORS = 20
+
+def report_page_diff(page_start, expected_page, actual_page, limit=MAX_REPORTED_ERRORS, label=""):
+    """Registra los bytes que difieren en una página (hasta limit) y devuelve cuántos hay."""
     errors = 0
-    i =  0
-    total = len(list(parsed_data.keys()))
-    for addr, expected in parsed_data.items():
-        i+=1
-        actual = read_flash_byte(addr)
-        
-        percent = i*100/total
-        pinta_barra(oled,percent,False)
-        
-        if actual != expected:
-            print(f"Mismatch at 0x{addr:04X}: expected 0x{expected:02X}, got 0x{actual:02X}")
+    for i in range(len(expected_page)):
+        if actual_page[i] != expected_page[i]:
+            if errors < limit:
+                log.warning("%sMismatch at 0x%04X: expected 0x%02X, got 0x%02X",
+                            label, page_start + i, expected_page[i], actual_page[i])
             errors += 1
-            if errors >= 20:  # Show more errors for debugging
-                print(f"... stopping after 20 errors")
-                break
-    if errors == 0:
-        print("Verification PASSED ✅")
-        return True
-    else:
-        print(f"Verification FAILED ❌ with {errors}+ errors")
-        return False
-    
-def read_flash_word(word_addr):
-    """Lee una palabra (low byte, high byte) de la memoria flash."""
-    
-    high_addr = (word_addr >> 8) & 0xFF
-    low_addr = word_addr & 0xFF
-    
-    # Comando 0x20 para leer el Byte Bajo (Low Byte)
-    low_byte = send_cmd_r4(0x20, high_addr, low_addr, 0x00)
-    
-    # Comando 0x28 para leer el Byte Alto (High Byte)
-    high_byte = send_cmd_r4(0x28, high_addr, low_addr, 0x00)
-    
-    return low_byte, high_byte
-    
-    
-def verify_flash(parsed_data, oled):
+    return errors
+
+def verify_flash(image, oled, pages=None):
     """
-    Verifica el contenido de la memoria flash del ATtiny13.
+    Verifica el contenido de la memoria flash de los ATtiny13 de los zócalos activos.
     Optimiza la velocidad al:
-    1. Iterar solo sobre las direcciones que contienen datos (basado en parsed_data).
-    2. Actualizar la barra de progreso solo una vez por página verificada.
+    1. Leer solo las páginas indicadas (por defecto las que tienen datos), cada una en bloque
+       y a la vez para todos los zócalos.
+    2. Comparar la página leída con su trozo de la imagen de una sola vez.
+    Los zócalos que no pasan se descartan.
     """
-    print("Verificando flash contents (Optimizado por alcance y velocidad)...")
-    errors = 0
+    log.info("Verificando flash contents (lectura por bloques)...")
     
-    byte_addresses = sorted(parsed_data.keys())
-    
-    if not byte_addresses:
-        print("No hay datos para verificar.")
-        pinta_barra(oled, 100, False)
+    image.set_page_size(device.page_size)
+    if pages is None:
+        pages = list(image.page_numbers())
+    TOTAL_PAGES_TO_VERIFY = len(pages)
+    if not TOTAL_PAGES_TO_VERIFY:
+        log.info("No hay datos para verificar.")
+        progreso.actual.empieza(oled, "Verificando", 0)
         return True
 
-    # 1. Preparación para la iteración y el progreso
-    
-    # word_addr = byte_addr // 2. Genera una lista de direcciones de palabra únicas y ordenadas a leer.
-    word_addresses_to_verify = sorted(list(set([addr // 2 for addr in byte_addresses])))
-    
-    # Calcular las páginas totales y el contador de progreso para la barra
-    pages_to_verify_set = set([addr // ATTINY13_PAGE_SIZE for addr in byte_addresses])
-    TOTAL_PAGES_TO_VERIFY = len(pages_to_verify_set)
-    pages_verified_count = 0
-    last_page_start = -1 
+    page_size = image.page_size
+    page_bufs = [bytearray(page_size) if port.active[i] else None for i in range(port.n)]
+    errors = [0] * port.n
+    ok = port.any_active()
+    barra = progreso.actual
+    barra.empieza(oled, "Verificando", TOTAL_PAGES_TO_VERIFY)
     
-    # 2. Bucle de Verificación (Itera solo sobre las palabras necesarias)
-    for word_addr in word_addresses_to_verify:
-        
-        # Calcular direcciones de byte
-        byte_addr_low = word_addr * 2
-        byte_addr_high = byte_addr_low + 1
-        
-        # Leer la palabra completa desde el chip
-        low_byte_actual, high_byte_actual = read_flash_word(word_addr)
-        
-        # 3. Comparación de los bytes
+    # Bucle de Verificación (una lectura en bloque por página)
+    for page in pages:
+        page_start = page * page_size
+        port.read_block(page_start, page_size, page_bufs)
+        expected_page = image.page(page)
         
-        # Verificar el byte bajo
-        if byte_addr_low in parsed_data:
-            expected = parsed_data[byte_addr_low]
-            actual = low_byte_actual
-            
-            if actual != expected:
-                print(f"Mismatch at 0x{byte_addr_low:04X}: expected 0x{expected:02X}, got 0x{actual:02X}")
-                errors += 1
-
-        # Verificar el byte alto
-        if byte_addr_high in parsed_data:
-            expected = parsed_data[byte_addr_high]
-            actual = high_byte_actual
-            
-            if actual != expected:
-                print(f"Mismatch at 0x{byte_addr_high:04X}: expected 0x{expected:02X}, got 0x{actual:02X}")
-                errors += 1
+        for i in range(port.n):
+            page_buf = page_bufs[i]
+            # Solo si la página no coincide se busca byte a byte qué falla
+            if page_buf is None or page_buf == expected_page:
+                continue
+            errors[i] += report_page_diff(page_start, expected_page, page_buf,
+                                          MAX_REPORTED_ERRORS - errors[i], port.label(i))
                 
-        # 4. Lógica de Parada Rápida por Error
-        if errors > 0 and errors % 20 == 0:
-            print(f"... stopping after {errors} errors")
-            pinta_barra(oled, 100, False)
+            # Lógica de Parada Rápida por Error
+            if errors[i] >= MAX_REPORTED_ERRORS:
+                log.warning("%s... stopping after %d errors", port.label(i), errors[i])
+                port.drop(i, "verify")
+                page_bufs[i] = None
+                ok = False
+
+        if not port.any_active():
+            barra.termina()
             return False
 
-        # 5. Lógica de Barra de Progreso (Actualizar solo si se verifica una página nueva)
-        current_page_start = byte_addr_low - (byte_addr_low % ATTINY13_PAGE_SIZE)
+        # Barra de progreso por página verificada (se repinta como mucho cada intervalo)
+        barra.avanza()
         
-        # Comprueba si el inicio de la página es diferente al último procesado
-        if current_page_start != last_page_start:
-            last_page_start = current_page_start
-            pages_verified_count += 1
-            
-            # Actualiza el progreso con base en las páginas verificadas
-            percent = pages_verified_count * 100 / TOTAL_PAGES_TO_VERIFY
-            pinta_barra(oled, percent, "Verificando", False)
-        
-    pinta_barra(oled, 100, "Verificando",False) # Asegura el 100% final
+    barra.termina() # Asegura el 100% final
 
-    # 6. Resultado Final
-    if errors == 0:
-        print("Verification PASSED ✅")
-        return True
-    else:
-        print(f"Verification FAILED ❌ with {errors} errors")
-        return False
+    # Resultado Final
+    for i in range(port.n):
+        if page_bufs[i] is None:
+            continue
+        if errors[i] == 0:
+            log.info("%sVerification PASSED ✅", port.label(i))
+        else:
+            log.error("%sVerification FAILED ❌ with %d errors", port.label(i), errors[i])
+            port.drop(i, "verify")
+            ok = False
+    return ok
     
 
-def program_flash(hex_content, oled):
+# ------------------------
+# EEPROM
+# ------------------------
+
+# La EEPROM va en una FlashImage aparte (del .eep que acompaña a la ROM) con
+# la página de EEPROM del chip. Los comandos son 0xA0 (leer), 0xC0 (escribir
+# un byte) y 0xC1/0xC2 (cargar/grabar página) en los chips con modo página.
+
+def read_eeprom_byte(addr, socket=0):
+    return send_cmd_r4(0xA0, (addr >> 8) & 0xFF, addr & 0xFF, 0x00, socket)
+
+def write_eeprom_byte(addr, value):
+    send_cmd_r4(0xC0, (addr >> 8) & 0xFF, addr & 0xFF, value)
+    wait_ready("eeprom", device.t_eeprom)
+
+def read_eeprom_block(start, length, into=None, socket=0):
+    """Lee length bytes de EEPROM desde start en into (o en un bytearray nuevo)."""
+    if into is None:
+        into = bytearray(length)
+    intos = [None] * port.n
+    intos[socket] = into
+    port.read_block(start, length, intos, eeprom=True)
+    return into
+
+def load_eeprom(filepath):
+    """Carga el .eep de la ROM filepath, o devuelve None si no tiene."""
+    path = imagen.eeprom_path(filepath)
+    try:
+        uos.stat(path)
+    except OSError:
+        return None
+    print(f"EEPROM image: {path}")
+    return load_hex(path, FlashImage(dispositivos.MAX_EEPROM_SIZE, dispositivos.MIN_EEPROM_PAGE))
+
+def _eeprom_range(image):
+    page_size = image.page_size
+    start = (image.min_addr // page_size) * page_size
+    end = (image.max_addr // page_size + 1) * page_size
+    return start, end
+
+def _read_eeprom_all(start, end):
+    """Contenido actual de [start, end) de la EEPROM de cada zócalo activo (None en el resto)."""
+    current = [bytearray(end - start) if port.active[i] else None for i in range(port.n)]
+    port.read_block(start, end - start, current, eeprom=True)
+    return current
+
+def program_eeprom(image, oled):
+    """
+    Graba las páginas con datos de image en la EEPROM de los zócalos activos.
+    Primero se lee en bloque el contenido actual y solo se cargan los bytes que
+    difieren en algún zócalo (tras el borrado, los 0xFF ya están). Con modo
+    página se graba cada página una vez (0xC1/0xC2); si no, byte a byte (0xC0).
+    Devuelve True si queda algún zócalo activo.
+    """
+    image.set_page_size(device.eeprom_page or 1)
+    page_size = image.page_size
+    start, end = _eeprom_range(image)
+    current = _read_eeprom_all(start, end)
+    pages = list(image.page_numbers())
+    written = 0
+    barra = progreso.actual
+    barra.empieza(oled, "EEPROM     ", len(pages), True)
+    for page in pages:
+        base = page * page_size
+        data = image.page(page)
+        offsets = []
+        for k in range(page_size):
+            for buf in current:
+                if buf is not None and buf[base + k - start] != data[k]:
+                    offsets.append(k)
+                    break
+        if offsets:
+            if device.eeprom_page:
+                if not port.load_eeprom_page(data, offsets):
+                    log.error("EEPROM page load at 0x%04X lost sync with the chip", base)
+                    return False
+                send_cmd_r4(0xC2, (base >> 8) & 0xFF, base & 0xFF, 0x00)
+                wait_ready("eeprom", device.t_eeprom)
+            else:
+                for k in offsets:
+                    write_eeprom_byte(base + k, data[k])
+            written += len(offsets)
+        barra.avanza()
+    barra.termina()
+    log.info("EEPROM: %d bytes written in %d pages (unchanged bytes skipped)", written, len(pages))
+    return port.any_active()
+
+def verify_eeprom(image):
+    """Relee en bloque la EEPROM de cada zócalo activo y descarta los que no coinciden."""
+    start, end = _eeprom_range(image)
+    current = _read_eeprom_all(start, end)
+    ok = True
+    for i in port.active_sockets():
+        buf = current[i]
+        errors = 0
+        for page in image.page_numbers():
+            base = page * image.page_size
+            expected = image.page(page)
+            actual = memoryview(buf)[base - start:base - start + image.page_size]
+            if actual != expected:
+                errors += report_page_diff(base, expected, actual, MAX_REPORTED_ERRORS - errors,
+                                           port.label(i) + "EEPROM ")
+        if errors:
+            log.error("%sEEPROM verification FAILED ❌ with %d errors", port.label(i), errors)
+            port.drop(i, "eeprom")
+            ok = False
+        else:
+            log.info("%sEEPROM verification PASSED ✅", port.label(i))
+    return ok
+
+
+# Modo "comprobar antes de grabar": si el chip ya tiene la imagen y los fuses
+# correctos no se borra ni se graba nada (config isp.check_first)
+CHECK_FIRST = isp_config.get("check_first", False)
+# Verificación: "after" (pasada completa al final) o "interleaved" (cada página
+# se relee justo después de grabarla y el trabajo se aborta en el primer fallo)
+VERIFY_MODE = isp_config.get("verify", "after")
+# Con isp.timing, el resumen de tiempos por fase (app/tiempos.py) se muestra
+# al acabar cada trabajo y se añade a /tiempos.log
+TIMING = isp_config.get("timing", False)
+last_result = None  # "programmed", "up to date" o "failed" tras program_flash()
+
+def is_up_to_date(image, eeprom=None):
+    """
+    Compara, para cada zócalo activo, fuses y el rango de páginas de la imagen
+    (y de la EEPROM si se da) con una sola lectura en bloque. Devuelve una
+    lista de bool por zócalo.
+    """
+    low_fuses = port.cmd_r4(0x50, 0x00, 0x00, 0x00)
+    high_fuses = port.cmd_r4(0x58, 0x08, 0x00, 0x00)
+    page_size = image.page_size
+    start = (image.min_addr // page_size) * page_size
+    end = (image.max_addr // page_size + 1) * page_size
+    current = [None] * port.n
+    for i in port.active_sockets():
+        if device.fuses_ok(low_fuses[i], high_fuses[i]):
+            current[i] = bytearray(end - start)
+    port.read_block(start, end - start, current)
+    expected = image.data[start:end]
+    result = [buf is not None and buf == expected for buf in current]
+    if eeprom is not None:
+        eeprom.set_page_size(device.eeprom_page or 1)
+        start, end = _eeprom_range(eeprom)
+        current = _read_eeprom_all(start, end)
+        expected = eeprom.data[start:end]
+        for i in range(port.n):
+            result[i] = result[i] and current[i] == expected
+    return result
+
+def _gang_result():
+    """Resultado global a partir del de cada zócalo: True solo si han ido bien todos."""
+    global last_result
+    ok = port.all_ok()
+    if not ok:
+        last_result = "failed"
+    elif port.results.count("up to date") == port.n:
+        last_result = "up to date"
+    else:
+        last_result = "programmed"
+    return ok
+
+def program_flash(hex_content, oled, eeprom=None):
     """
-    Programa la memoria flash del ATtiny13 basándose en el contenido del archivo HEX,
-    optimizando el proceso al iterar solo sobre las páginas con datos.
+    Programa la memoria flash del ATtiny13 a partir del texto HEX o de una
+    FlashImage ya cargada, iterando solo sobre las páginas con datos.
+    eeprom es una FlashImage opcional con el contenido de la EEPROM (ver
+    load_eeprom()). Con varios zócalos todos se graban a la vez; el resultado
+    de cada uno queda en port.results.
     """
     
+    global last_result
+    last_result = "failed"
+    
     # 1. Parsing y Comprobación Inicial
-    parsed_data = parse_hex_file(hex_content)
-    if not parsed_data:
+    if isinstance(hex_content, FlashImage):
+        image = hex_content
+    else:
+        image = parse_hex_file(hex_content)
+    if not image:
         print("No valid data found in hex file.")
         return False
 
-    min_addr = min(parsed_data.keys())
-    max_addr = max(parsed_data.keys())
+    min_addr = image.min_addr
+    max_addr = image.max_addr
     
-    print(f"Parsed {len(parsed_data)} bytes from hex file")
+    print(f"Parsed {len(image)} bytes from hex file")
     print(f"Address range: 0x{min_addr:04X} to 0x{max_addr:04X}")
+    if eeprom is not None and not len(eeprom):
+        eeprom = None
 
     # 2. Entrada al Modo de Programación
+    tiempos.empieza()
+    t = tiempos.inicio()
     if not start_programming():
+        tiempos.termina()
         return False
+    tiempos.fin(tiempos.START, t)
     
     # ----------------------------------------------------
     # Usa try/finally para asegurar que end_programming() siempre se llama
     try:
-        # 3. Comprobación de la Firma
-        sig = read_signature_bytes()
-        print(f"Read signature: {sig} (hex: {[hex(x) for x in sig]})")
-
-        if sig != ATTINY13_SIGNATURE:
-            print("Error: Detected chip is not an ATtiny13!")
-            print(f"Expected: {[hex(x) for x in ATTINY13_SIGNATURE]}")
-            print(f"Got: {sig} ({[hex(x) for x in sig]})")
+        # 3. Identificación del chip por su firma (geometría y tiempos del registro)
+        t = tiempos.inicio()
+        dev = detect_device()
+        tiempos.fin(tiempos.SIGNATURE, t)
+        if dev is None:
             return False # Sale, y finally cierra la programación
+        if image.signature is not None and bytes(image.signature) != dev.signature:
+            rom_dev = dispositivos.busca(image.signature)
+            print(f"Warning: ROM is for {rom_dev.name if rom_dev else [hex(x) for x in image.signature]}, chip is {dev.name}")
+        if image.max_addr >= dev.flash_size:
+            print(f"Error: image ends at 0x{image.max_addr:04X} but {dev.name} has {dev.flash_size} bytes of flash")
+            for i in port.active_sockets():
+                port.drop(i, "too big")
+            return False
+        if eeprom is not None and eeprom.max_addr >= dev.eeprom_size:
+            print(f"Error: EEPROM image ends at 0x{eeprom.max_addr:04X} but {dev.name} has {dev.eeprom_size} bytes of EEPROM")
+            for i in port.active_sockets():
+                port.drop(i, "eep too big")
+            return False
+        image.set_page_size(dev.page_size)
+
+        # 3b. Los chips que ya están grabados con esta imagen no se tocan
+        if CHECK_FIRST:
+            for i, up_to_date in enumerate(is_up_to_date(image, eeprom)):
+                if up_to_date:
+                    print(f"{port.label(i)}Chip already up to date: flash, EEPROM and fuses match, skipping erase/program.")
+                    port.finish(i, "up to date")
+            if not port.any_active():
+                progreso.actual.empieza(oled, "Al dia     ", 0)
+                return _gang_result()
 
         # 4. Programación de Fuses
-        display_fuse_settings() # Mostrar antes
+        for i in port.active_sockets():
+            display_fuse_settings(i) # Mostrar antes
         
+        t = tiempos.inicio()
         if not program_fuses_for_9_6mhz():
             print("Failed to program fuses!")
             return False
+        tiempos.fin(tiempos.FUSES, t)
 
-        display_fuse_settings() # Mostrar después
+        for i in port.active_sockets():
+            display_fuse_settings(i) # Mostrar después
 
         # 5. Borrado del Chip
+        t = tiempos.inicio()
         chip_erase()
+        tiempos.fin(tiempos.ERASE, t)
 
-        # 6. Cálculo del Rango de Páginas Optimizado (Basado en datos)
-        
-        # Calcular el inicio de la primera página con datos
-        start_page_addr = min_addr - (min_addr % ATTINY13_PAGE_SIZE)
-        
-        # Calcular el final de la última página con datos
-        # Esto nos da el byte que sigue al último byte de la última página
-        bytes_to_end_page = ATTINY13_PAGE_SIZE - 1 - (max_addr % ATTINY13_PAGE_SIZE)
-        end_page_addr = max_addr + bytes_to_end_page + 1 
-        
-        # Asegurarse de no exceder los límites físicos del chip
-        if end_page_addr > FLASH_SIZE:
-            end_page_addr = FLASH_SIZE
+        # 6. Páginas a grabar: las que tienen datos y no están enteras a 0xFF
+        # (tras el borrado ya están así)
+        page_size = image.page_size
+        blank_page = b"\xff" * page_size
+        pages_to_write = [p for p in image.page_numbers() if image.page(p) != blank_page]
         
         # Pre-calcular el total de páginas a flashear para la barra de progreso
-        TOTAL_PAGES_TO_FLASH = (end_page_addr - start_page_addr) // ATTINY13_PAGE_SIZE
+        TOTAL_PAGES_TO_FLASH = len(pages_to_write)
         page_count = 0
+        barra = progreso.actual
+        log.info("Pages to write: %d (blank pages skipped)", TOTAL_PAGES_TO_FLASH)
         
-        oled.text(str(len(parsed_data)) + " Bytes", 0, 55, 1)
+        oled.text(str(len(image)) + " Bytes", 0, 55, 1)
+        barra.empieza(oled, "Grabando   ", TOTAL_PAGES_TO_FLASH, True)
         
-        # 7. Bucle de Programación por Páginas (Optimizado)
-        for page_start in range(start_page_addr, end_page_addr, ATTINY13_PAGE_SIZE):
-            
-            # Inicializar la página con 0xFF (vacío) - usar bytearray es más eficiente
-            page_data = bytearray([0xFF] * ATTINY13_PAGE_SIZE)
+        interleaved = VERIFY_MODE == "interleaved"
+        debug = log.enabled(log.DEBUG)
+        page_bufs = [bytearray(page_size) for _ in range(port.n)]
+        
+        # 7. Bucle de Programación por Páginas (cada página es un trozo de la imagen)
+        for page in pages_to_write:
+            page_start = page * page_size
+            if debug:
+                log.debug("Programming page %d at address 0x%04X...", page_count, page_start)
+            t = tiempos.inicio()
+            if not program_flash_page(page_start, image.page(page)):
+                return False
+            tiempos.fin(tiempos.PAGE, t)
             
-            # Recorrer los bytes de la página para insertar los datos del HEX
-            for i in range(ATTINY13_PAGE_SIZE):
-                byte_addr = page_start + i
-                
-                if byte_addr in parsed_data:
-                    page_data[i] = parsed_data[byte_addr]
-                    
-            print(f"Programming page {page_count} at address 0x{page_start:04X}...")
-            program_flash_page(page_start, page_data)
+            # Verificación intercalada: releer la página recién escrita
+            if interleaved:
+                port.read_block(page_start, page_size,
+                                [page_bufs[i] if port.active[i] else None for i in range(port.n)])
+                for i in port.active_sockets():
+                    if page_bufs[i] != image.page(page):
+                        log.error("%sVerification FAILED ❌ on page %d (0x%04X), aborting", port.label(i), page, page_start)
+                        report_page_diff(page_start, image.page(page), page_bufs[i], label=port.label(i))
+                        port.drop(i, "verify")
+                if not port.any_active():
+                    return False
                 
-            # Actualizar la barra de progreso
+            # Actualizar la barra de progreso: solo contadores, el dibujo va limitado en el tiempo
             page_count += 1
-            percent = page_count * 100 / TOTAL_PAGES_TO_FLASH
-            pinta_barra(oled, percent,"Grabando   ",True)
+            barra.avanza()
 
-        #pinta_barra(oled, 100, "Grabando   ", True) # Asegura el 100% en la pantalla    
-        print("Flash programming complete.")
+        barra.termina() # Asegura el 100% en la pantalla
+        log.info("Flash programming complete.")
+        print_busy_stats()
         
-        # 8. Verificación
-        ok = verify_flash(parsed_data, oled)
-        return ok
+        # 8. Verificación (ya hecha página a página en modo intercalado)
+        if interleaved:
+            log.info("Verification PASSED ✅ (interleaved)")
+        else:
+            t = tiempos.inicio()
+            verify_flash(image, oled, pages_to_write)
+            tiempos.fin(tiempos.VERIFY, t)
+
+        # 9. EEPROM (opcional, del .eep que acompaña a la ROM)
+        if eeprom is not None and port.any_active():
+            t = tiempos.inicio()
+            if program_eeprom(eeprom, oled):
+                verify_eeprom(eeprom)
+            tiempos.fin(tiempos.EEPROM, t)
+
+        for i in port.active_sockets():
+            port.finish(i, "programmed")
+        return _gang_result()
         
     finally:
+        progreso.actual.resultado = last_result
         # Esto garantiza que el modo de programación SPI se cierre
         # incluso si ocurre un error en el medio.
         end_programming()
+        tiempos.termina()
+        log.flush()  # Mensajes del trabajo, que los bucles solo han guardado en RAM
 
 # -------------------------------------------------------------------
 # Lectura y Formato HEX
 # -------------------------------------------------------------------
 
-def create_hex_record(address, data):
-    """Genera una línea (registro) en formato Intel HEX."""
-    length = len(data)
-    checksum = length + (address >> 8) + (address & 0xFF) + 0x00  
-    hex_data = ""
-    
-    for byte in data:
-        hex_data += f"{byte:02X}"
-        checksum += byte
-        
-    checksum = (~checksum + 1) & 0xFF
-    
-    # Formato: :LLAAAATTDD...DCC
-    return f":{length:02X}{address:04X}00{hex_data}{checksum:02X}\n"
-# Definir una constante para el límite de bytes vacíos consecutivos (Ya no es necesario, pero se mantiene la estructura)
-# BLANK_SECTION_LIMIT = 128 
+# Buffers reutilizados por write_hex(): el registro binario y su línea de texto
+_hex_rec = bytearray(BYTES_PER_RECORD + 5)             # LL AAAA TT datos CC
+_hex_line = bytearray(1 + 2 * len(_hex_rec) + 1)        # ':' + hex + '\n'
+_hex_line[0] = 0x3A
 
-def read_rom_to_hex(oled, pinta_barra):
+def write_hex(out, data, length):
+    """
+    Escribe los length primeros bytes de data como Intel HEX en out (un
+    archivo o cualquier objeto con write(), como un stream HTTP), registro a
+    registro desde buffers reutilizados, y cierra con el registro EOF.
     """
-    Lee TODA la memoria flash del chip, identifica el rango de datos, 
-    y devuelve el contenido como HEX ACORTADO hasta la última dirección con datos.
+    src = memoryview(data)
+    rec = _hex_rec
+    rec_mv = memoryview(rec)
+    line = _hex_line
+    line_mv = memoryview(line)
+    for address in range(0, length, BYTES_PER_RECORD):
+        n = min(BYTES_PER_RECORD, length - address)
+        rec[0] = n
+        rec[1] = (address >> 8) & 0xFF
+        rec[2] = address & 0xFF
+        rec[3] = 0x00
+        rec[4:4 + n] = src[address:address + n]
+        rec[4 + n] = -sum(rec_mv[:4 + n]) & 0xFF
+        end = 1 + 2 * (n + 5)
+        line[1:end] = ubinascii.hexlify(rec_mv[:n + 5]).upper()
+        line[end] = 0x0A
+        out.write(line_mv[:end + 1])
+    out.write(b":00000001FF\n")
+
+def data_end(data):
+    """Longitud útil de un volcado: hasta el último byte distinto de 0xFF (0 si está vacío)."""
+    i = len(data)
+    while i and data[i - 1] == 0xFF:
+        i -= 1
+    return i
+
+DUMP_CHUNK = 256  # Bytes por lectura en bloque del volcado (y por paso de la barra)
+
+def dump_flash(oled):
+    """
+    Lee TODA la memoria flash del chip del zócalo 0 en un bytearray, con
+    lecturas en bloque. Deja la firma en dump_signature y la entrada del
+    registro en device. Devuelve el bytearray o None si no hay chip.
     """
     print("\nIniciando lectura de la ROM (DUMP) de la Flash completa...")
     
+    global dump_signature, dump_fuses, device
     init_isp()
-    if not start_programming():
+    if not start_programming() or not port.active[0]:
+        end_programming()
         print("❌ Error: No se pudo entrar en modo programación.")
         return None
-
-    # Estructura temporal para guardar todas las líneas HEX generadas
-    raw_hex_records = [] 
-    
-    total_bytes = FLASH_SIZE
-    current_addr = 0
-    last_data_addr = -1    # Inicializado a -1. Si sigue siendo -1, el chip estaba borrado.
-    
     try:
-        while current_addr < total_bytes:
-            data_record = []
-            start_addr_for_record = current_addr
-            
-            # Leemos BYTES_PER_RECORD bytes (8 palabras)
-            words_to_read = BYTES_PER_RECORD // 2
-            
-            # --- Lógica de Lectura ---
-            for word_index in range(words_to_read):
-                if current_addr >= total_bytes:
-                    break
-                
-                word_addr = current_addr // 2
-                low_byte, high_byte = read_flash_word(word_addr)
-                
-                bytes_read = []
-                bytes_read.append(low_byte)
-                
-                if current_addr + 1 < total_bytes:
-                    bytes_read.append(high_byte)
-                
-                # --- Lógica de Rastreo de Datos ---
-                for byte_value in bytes_read:
-                    
-                    if byte_value != 0xFF:
-                        # Si el byte no está vacío, actualizamos la última dirección de datos significativa.
-                        last_data_addr = current_addr
-                        
-                    data_record.append(byte_value)
-                    current_addr += 1 
-
-            # Generar y almacenar el registro HEX temporalmente
-            if data_record:
-                hex_line = create_hex_record(start_addr_for_record, data_record).strip()
-                raw_hex_records.append(hex_line)
-            
-            # Actualizar la barra de progreso
-            percent = current_addr * 100 / total_bytes
-                                        
-            pinta_barra(oled, percent, "Leyendo    ", False)
-        
-        # -------------------------------------------------------------------
-        # Generación del Archivo HEX Final (Acortado)
-        # -------------------------------------------------------------------
-        final_hex_content = ""
-        
-        if last_data_addr == -1:
-            print("El chip parece estar completamente vacío (0xFF).")
-        else:
-            # 1. Iterar sobre los registros brutos generados
-            for line in raw_hex_records:
-                # Extraer la dirección de inicio del registro y la cuenta de bytes
-                addr = int(line[3:7], 16)
-                byte_count = int(line[1:3], 16)
-                
-                # Criterio de inclusión: Si el registro termina ANTES o EXACTAMENTE 
-                # en la última dirección de datos significativa.
-                if addr <= last_data_addr and addr + byte_count > last_data_addr:
-                    # Caso 1: El registro contiene last_data_addr
-                    # Cortamos el registro para que termine justo después de last_data_addr.
-                    bytes_to_keep = (last_data_addr - addr) + 1
-                    
-                    # Recalculamos el registro HEX
-                    data_slice = [int(line[9 + i*2: 11 + i*2], 16) for i in range(bytes_to_keep)]
-                    final_hex_content += create_hex_record(addr, data_slice).strip() + "\n"
-                    
-                    # Una vez que se incluye la última dirección de datos, salimos del bucle.
-                    break 
-
-                elif addr + byte_count <= last_data_addr:
-                    # Caso 2: El registro está completamente antes de last_data_addr
-                    # Incluimos la línea completa.
-                    final_hex_content += line + "\n"
-            
-            print(f"Lectura de ROM completa. Archivo HEX acortado hasta 0x{last_data_addr:04X}.")
-            
-        # Escribir el registro final (End Of File: EOF)
-        final_hex_content += ":00000001FF\n" 
-        
-        return final_hex_content
+        dump_signature = bytes(read_signature_bytes())
+        dev = dispositivos.busca(dump_signature)
+        if dev is None:
+            print(f"❌ Error: Firma desconocida {[hex(x) for x in dump_signature]}")
+            return None
+        device = dev
+        print(f"Chip detectado: {dev.name} ({dev.flash_size} bytes de flash)")
+        dump_fuses = (read_low_fuse(), read_high_fuse(), read_lock_bits())
+
+        total_bytes = dev.flash_size
+        data = bytearray(total_bytes)
+        view = memoryview(data)
+        barra = progreso.actual
+        barra.empieza(oled, "Leyendo    ", total_bytes)
+        for addr in range(0, total_bytes, DUMP_CHUNK):
+            n = min(DUMP_CHUNK, total_bytes - addr)
+            read_flash_block(addr, n, into=view[addr:addr + n])
+            barra.avanza(n)
+        barra.termina("read")
+        return data
         
     except Exception as e:
         print(f"❌ Error durante la lectura de la ROM: {e}")
@@ -690,3 +1300,43 @@ def read_rom_to_hex(oled, pinta_barra):
         
     finally:
         end_programming()
+
+def read_rom_to_hex(oled, filepath):
+    """
+    Lee TODA la memoria flash del chip y guarda en filepath el contenido como
+    HEX ACORTADO hasta la última dirección con datos, junto con su caché
+    binaria. Devuelve el número de bytes volcados o None si no se pudo leer.
+    """
+    data = dump_flash(oled)
+    if data is None:
+        return None
+    length = data_end(data)
+    if length == 0:
+        print("El chip parece estar completamente vacío (0xFF).")
+    else:
+        print(f"Lectura de ROM completa. Archivo HEX acortado hasta 0x{length - 1:04X}.")
+    with open(filepath, 'wb') as f:
+        write_hex(f, data, length)
+    # La caché se genera desde el volcado, sin volver a leer el .hex
+    try:
+        image = FlashImage(imagen.DEFAULT_SIZE, imagen.DEFAULT_PAGE_SIZE)
+        image.put(0, memoryview(data)[:length])
+        image.signature = dump_signature
+        imagen.save_cache(image, filepath)
+    except (OSError, ValueError) as e:
+        print(f"No se pudo generar la caché de {filepath}: {e}")
+    return length
+
+def read_rom_to_bin(oled, filepath, compress=False):
+    """
+    Como read_rom_to_hex(), pero guarda en filepath un volcado binario con
+    cabecera (firma, fuses, lock bits y CRC), comprimido con deflate si compress.
+    Devuelve el número de bytes volcados o None si no se pudo leer.
+    """
+    data = dump_flash(oled)
+    if data is None:
+        return None
+    length = data_end(data)
+    imagen.save_dump(filepath, data, length, dump_signature, dump_fuses, compress)
+    print(f"Volcado de {length} bytes guardado en {filepath}")
+    return length
@@ -8,7 +8,8 @@ def carga_config():
             config = json.loads(config_file.read())
     except OSError:
         print("Config file not found or error reading. Using default config.")
-        config = {"wifi": {"ssid": "", "pwd": ""},"fastboot": false, "lastrom":""} # Configuración por defecto
+        config = {"wifi": {"ssid": "", "pwd": ""},"fastboot": False, "lastrom":"", "dump_format": "hex", "production": False, "log": {"level": "info", "size": 64},
+                  "isp": {"transport": "bitbang", "baudrate": 100000, "check_first": False, "verify": "after", "timing": False}} # Configuración por defecto
     return config
 
 def guarda_config(config):
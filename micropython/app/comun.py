@@ -1,3 +1,6 @@
+import app.tiempos as tiempos
+import app.graficos as graficos
+
 def mostrar_texto_multilinea(oled, texto, x, y, color):
     ANCHO_CARACTER = 8
     max_chars_por_linea = 128 // ANCHO_CARACTER
@@ -10,6 +13,7 @@ def mostrar_texto_multilinea(oled, texto, x, y, color):
         
     
 def pinta_barra(oled,p,txt,graba):
+    t = tiempos.inicio()
     x, y = 1, 20
     w, h = 126, 20
     #txt = "Grabando   " if graba else "Verificando"
@@ -29,14 +33,11 @@ def pinta_barra(oled,p,txt,graba):
         oled.text(f" {round(p)}%", 90, y + h + 2, 1)   
     
     oled.show()
+    tiempos.fin(tiempos.DISPLAY, t)
     
 def mi_barra(oled,x,y,w,h):
-    for i in range(x, x + w):
-        for j in range(y, y + h):
-            if (i + j) % 2 == 0: # Si la suma de las coordenadas es par, enciende el píxel
-                oled.pixel(i, j, 1) # 1 para encendido
-            else:
-                oled.pixel(i, j, 0) # 0 para apagado (o simplemente no dibujarlo si ya está apagado)
-    oled.show() # Actualiza la pantalla para mostrar los cambios
+    # Damero: píxel encendido donde x + y es par. Se pinta de un blit desde el
+    # Bitmap precalculado; el show() lo hace pinta_barra()
+    graficos.blit_damero(oled, x, y, w, h)
 
 
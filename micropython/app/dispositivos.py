@@ -0,0 +1,93 @@
+# Registro de dispositivos soportados, indexado por la firma que devuelve el chip.
+#
+# Cada entrada guarda la geometría (flash, EEPROM, páginas) y los tiempos tWD
+# del apartado "Serial Programming" del datasheet: la espera mínima tras cada
+# escritura cuando no se sondea RDY/BSY, en microsegundos.
+#
+# Las máscaras de fuses marcan los bits que deciden si el chip sigue siendo
+# programable por ISP (RSTDISBL, DWEN, SPIEN): un valor es seguro si
+# (fuse & mask) == safe. low_bits/high_bits nombran los bits de cada fuse del
+# 7 al 0 ("-": sin uso), para mostrarlos; un bit a 0 está programado.
+
+
+class Dispositivo:
+    def __init__(self, name, signature, flash_size, eeprom_size, page_size,
+                 low_mask, low_safe, high_mask, high_safe, low_bits, high_bits,
+                 low_fuse=None, eeprom_page=4,
+                 t_flash=4500, t_eeprom=4000, t_erase=9000, t_fuse=4500):
+        self.name = name
+        self.signature = bytes(signature)
+        self.flash_size = flash_size
+        self.eeprom_size = eeprom_size
+        self.page_size = page_size           # Bytes por página de flash
+        self.eeprom_page = eeprom_page       # Bytes por página de EEPROM (0: sin modo página)
+        self.low_mask = low_mask
+        self.low_safe = low_safe
+        self.high_mask = high_mask
+        self.high_safe = high_safe
+        self.low_bits = low_bits
+        self.high_bits = high_bits
+        self.low_fuse = low_fuse             # Fuse bajo a grabar (None: no se toca)
+        self.t_flash = t_flash
+        self.t_eeprom = t_eeprom
+        self.t_erase = t_erase
+        self.t_fuse = t_fuse
+
+    def __repr__(self):
+        return self.name
+
+    def low_ok(self, value):
+        return value & self.low_mask == self.low_safe
+
+    def high_ok(self, value):
+        return value & self.high_mask == self.high_safe
+
+    def fuses_ok(self, low, high):
+        """True si los fuses son seguros y el bajo es el que se grabaría."""
+        if self.low_fuse is not None and low != self.low_fuse:
+            return False
+        return self.low_ok(low) and self.high_ok(high)
+
+
+# Nombres de los bits de los fuses (del 7 al 0), según cada datasheet
+_T13_LOW = ("SPIEN", "EESAVE", "WDTON", "CKDIV8", "SUT1", "SUT0", "CKSEL1", "CKSEL0")
+_T13_HIGH = ("-", "-", "-", "SELFPRGEN", "DWEN", "BODLEVEL1", "BODLEVEL0", "RSTDISBL")
+_TX5_LOW = ("CKDIV8", "CKOUT", "SUT1", "SUT0", "CKSEL3", "CKSEL2", "CKSEL1", "CKSEL0")
+_TX5_HIGH = ("RSTDISBL", "DWEN", "SPIEN", "WDTON", "EESAVE", "BODLEVEL2", "BODLEVEL1", "BODLEVEL0")
+_T2313_HIGH = ("DWEN", "EESAVE", "SPIEN", "WDTON", "BODLEVEL2", "BODLEVEL1", "BODLEVEL0", "RSTDISBL")
+
+# ATtiny13: SPIEN está en el fuse bajo (bit 7); RSTDISBL (bit 0) y DWEN (bit 3) en el alto.
+# Es el único al que se le ajusta el reloj: 0x7A = 9.6 MHz sin CKDIV8.
+ATTINY13 = Dispositivo("ATtiny13", b"\x1e\x90\x07", 1024, 64, 32,
+                       0x80, 0x00, 0x09, 0x09, _T13_LOW, _T13_HIGH, low_fuse=0x7A)
+
+# ATtiny25/45/85 y 24/44/84: RSTDISBL (bit 7), DWEN (bit 6) y SPIEN (bit 5) en el alto
+ATTINY25 = Dispositivo("ATtiny25", b"\x1e\x91\x08", 2048, 128, 32, 0x00, 0x00, 0xE0, 0xC0, _TX5_LOW, _TX5_HIGH)
+ATTINY45 = Dispositivo("ATtiny45", b"\x1e\x92\x06", 4096, 256, 64, 0x00, 0x00, 0xE0, 0xC0, _TX5_LOW, _TX5_HIGH)
+ATTINY85 = Dispositivo("ATtiny85", b"\x1e\x93\x0b", 8192, 512, 64, 0x00, 0x00, 0xE0, 0xC0, _TX5_LOW, _TX5_HIGH)
+ATTINY24 = Dispositivo("ATtiny24", b"\x1e\x91\x0b", 2048, 128, 32, 0x00, 0x00, 0xE0, 0xC0, _TX5_LOW, _TX5_HIGH)
+ATTINY44 = Dispositivo("ATtiny44", b"\x1e\x92\x07", 4096, 256, 64, 0x00, 0x00, 0xE0, 0xC0, _TX5_LOW, _TX5_HIGH)
+ATTINY84 = Dispositivo("ATtiny84", b"\x1e\x93\x0c", 8192, 512, 64, 0x00, 0x00, 0xE0, 0xC0, _TX5_LOW, _TX5_HIGH)
+
+# ATtiny2313: DWEN (bit 7), SPIEN (bit 5) y RSTDISBL (bit 0) en el alto
+ATTINY2313 = Dispositivo("ATtiny2313", b"\x1e\x91\x0a", 2048, 128, 32, 0x00, 0x00, 0xA1, 0x81,
+                         _TX5_LOW, _T2313_HIGH)
+
+DISPOSITIVOS = (ATTINY13, ATTINY25, ATTINY45, ATTINY85,
+                ATTINY24, ATTINY44, ATTINY84, ATTINY2313)
+
+# Las imágenes se dimensionan para el chip más grande y la página más pequeña
+MAX_FLASH_SIZE = max([d.flash_size for d in DISPOSITIVOS])
+MAX_PAGE_SIZE = max([d.page_size for d in DISPOSITIVOS])
+MIN_PAGE_SIZE = min([d.page_size for d in DISPOSITIVOS])
+MAX_EEPROM_SIZE = max([d.eeprom_size for d in DISPOSITIVOS])
+MIN_EEPROM_PAGE = min([d.eeprom_page or 1 for d in DISPOSITIVOS])
+
+
+def busca(signature):
+    """Entrada del registro para la firma leída (lista o bytes), o None si no se conoce."""
+    signature = bytes(signature)
+    for d in DISPOSITIVOS:
+        if d.signature == signature:
+            return d
+    return None
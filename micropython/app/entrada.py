@@ -0,0 +1,147 @@
+# Botones por interrupción con cola de eventos.
+#
+# Cada botón tiene un Pin.irq en los dos flancos. El manejador solo filtra
+# rebotes por tiempo y mete la pulsación en una cola circular de bytes
+# preasignada (no reserva memoria), así que no se pierde ninguna pulsación
+# aunque el bucle principal esté ocupado grabando o repintando, y mientras
+# nadie lee la cola los botones no cuestan nada.
+#
+# Las pulsaciones largas y la repetición se calculan al leer la cola (en
+# evento()/espera()), a partir del instante en que se pulsó cada botón.
+#
+# Un evento es un byte: botón en los 4 bits bajos, tipo en los altos.
+#   ev = entrada.espera(100)
+#   if ev is not None and entrada.boton(ev) == entrada.BACK: ...
+
+import machine
+import utime
+from array import array
+
+UP = 0
+DOWN = 1
+SELECT = 2
+BACK = 3
+
+PULSA = 0    # Pulsación (al bajar el pin, ya sin rebote)
+LARGA = 1    # Se ha mantenido LONG_MS
+REPITE = 2   # Sigue pulsado: uno cada REPEAT_MS tras la larga
+
+DEBOUNCE_MS = 30
+LONG_MS = 600
+REPEAT_MS = 150
+COLA = 16           # Eventos que caben sin leer
+ESPERA_MS = 10      # Paso de espera() mientras no hay eventos
+
+
+class Entrada:
+    def __init__(self, pins):
+        """pins: lista de machine.Pin (entrada con pull-up) en el orden UP, DOWN, SELECT, BACK."""
+        self.pins = pins
+        n = len(pins)
+        self._cola = bytearray(COLA)
+        self._pos = array('i', [0, 0])      # Lectura, escritura
+        self._cambio = array('i', [0] * n)  # ticks_ms del último flanco aceptado
+        self._desde = array('i', [0] * n)   # ticks_ms de la pulsación en curso
+        self._pulsado = bytearray(n)
+        self._emitidos = bytearray(n)       # Larga/repeticiones ya emitidas de la pulsación
+        for i, pin in enumerate(pins):
+            pin.irq(trigger=machine.Pin.IRQ_FALLING | machine.Pin.IRQ_RISING,
+                    handler=lambda p, i=i: self._irq(i))
+
+    def _push(self, ev):
+        pos = self._pos
+        siguiente = (pos[1] + 1) % COLA
+        if siguiente != pos[0]:  # Con la cola llena se descarta el más nuevo
+            self._cola[pos[1]] = ev
+            pos[1] = siguiente
+
+    def _irq(self, i):
+        now = utime.ticks_ms()
+        if utime.ticks_diff(now, self._cambio[i]) < DEBOUNCE_MS:
+            return
+        self._cambio[i] = now
+        if self.pins[i].value() == 0:
+            if not self._pulsado[i]:
+                self._pulsado[i] = 1
+                self._desde[i] = now
+                self._emitidos[i] = 0
+                self._push(i | (PULSA << 4))
+        else:
+            self._pulsado[i] = 0
+
+    def _revisa(self):
+        """Pulsaciones largas y repetición de los botones que siguen abajo."""
+        now = utime.ticks_ms()
+        for i in range(len(self.pins)):
+            if not self._pulsado[i]:
+                continue
+            if self.pins[i].value():
+                # El flanco de subida se perdió entre rebotes: ya está suelto
+                if utime.ticks_diff(now, self._cambio[i]) >= DEBOUNCE_MS:
+                    self._pulsado[i] = 0
+                continue
+            held = utime.ticks_diff(now, self._desde[i])
+            k = self._emitidos[i]
+            if held >= LONG_MS + k * REPEAT_MS and k < 255:
+                self._emitidos[i] = k + 1
+                self._push(i | ((LARGA if k == 0 else REPITE) << 4))
+
+    def evento(self):
+        """Siguiente evento de la cola, o None si no hay."""
+        self._revisa()
+        pos = self._pos
+        if pos[0] == pos[1]:
+            return None
+        ev = self._cola[pos[0]]
+        pos[0] = (pos[0] + 1) % COLA
+        return ev
+
+    def espera(self, timeout_ms=None):
+        """Espera hasta timeout_ms (None: sin límite) a que llegue un evento."""
+        t0 = utime.ticks_ms()
+        while True:
+            ev = self.evento()
+            if ev is not None:
+                return ev
+            if timeout_ms is not None:
+                restante = timeout_ms - utime.ticks_diff(utime.ticks_ms(), t0)
+                if restante <= 0:
+                    return None
+                utime.sleep_ms(min(ESPERA_MS, restante))
+            else:
+                utime.sleep_ms(ESPERA_MS)
+
+    def espera_pulsacion(self, *botones):
+        """Espera sin límite a que se pulse alguno de los botones dados y devuelve cuál."""
+        while True:
+            ev = self.espera()
+            if (ev >> 4) == PULSA and (ev & 0x0F) in botones:
+                return ev & 0x0F
+
+    def pulsado(self, boton):
+        return self._pulsado[boton] == 1
+
+    def vacia(self):
+        self._pos[0] = self._pos[1]
+
+
+def boton(ev):
+    return ev & 0x0F
+
+
+def tipo(ev):
+    return ev >> 4
+
+
+def es(ev, b, tipos=(PULSA,)):
+    """True si ev es del botón b y de alguno de los tipos dados."""
+    return ev is not None and (ev & 0x0F) == b and (ev >> 4) in tipos
+
+
+servicio = None  # La instancia que crea boot.py con inicia()
+
+
+def inicia(up, down, select, back):
+    global servicio
+    servicio = Entrada([up, down, select, back])
+    return servicio
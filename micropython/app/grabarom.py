@@ -1,7 +1,22 @@
 from app.attiny import *
+import app.attiny as attiny
+import app.entrada as entrada
+
+
+# Modo producción (config "production"): sondeo de inserción cada
+# PRODUCTION_POLL_MS y PRESENCE_CHECKS lecturas seguidas para dar el chip por colocado
+PRODUCTION_POLL_MS = 50
+PRESENCE_CHECKS = 2
 
 
 def run(oled, back_btn, select_btn, w, h, utime, math, random, framebuf):
+    config = cfg.carga_config()
+    if config.get("production", False):
+        produccion(oled, "/roms/" + config["lastrom"], utime)
+        oled.fill(0)
+        oled.show()
+        return
+
     should_run = True 
     while should_run:
         
@@ -13,11 +28,22 @@ def run(oled, back_btn, select_btn, w, h, utime, math, random, framebuf):
         oled.text(config["lastrom"], 0, 9, 1)
         
         result = flashea_attiny("/roms/"+config["lastrom"],oled)
+        if attiny.TIMING:
+            muestra_tiempos(oled, config["lastrom"])
         
-        if result:
+        if attiny.port.n > 1:
+            # Gang: una línea por zócalo (en dos columnas si no caben)
+            oled.fill(0)
+            oled.text(config["lastrom"][:16], 0, 1, 1)
+            muestra_zocalos(oled, attiny.port.results)
+            oled.text("3-Repite 4-Salir", 0, 55, 1)
+        elif result:
             oled.fill(0)
             mostrar_texto_multilinea(oled, config["lastrom"], 0, 17, 1)
-            oled.text("ha sido grabada", 0, 35, 1)
+            if attiny.last_result == "up to date":
+                oled.text("ya estaba al dia", 0, 35, 1)
+            else:
+                oled.text("ha sido grabada", 0, 35, 1)
                          
             oled.text("3-Repite 4-Salir", 0, 55, 1)
         else:
@@ -30,27 +56,20 @@ def run(oled, back_btn, select_btn, w, h, utime, math, random, framebuf):
         oled.show()
         # -------------------------------------------------------------
         
-        # 2. Bucle de Espera de Botón
-        # Espera a que se pulse un botón antes de continuar o salir
-        while back_btn.value() != 0 and select_btn.value() != 0:
-            utime.sleep_ms(50) # Espera pequeña para ahorrar CPU
-            pass
+        # 2. Espera de Botón: la pulsación llega por la cola de app/entrada.py
+        # (una hecha durante la grabación tampoco se pierde)
+        boton = entrada.servicio.espera_pulsacion(entrada.BACK, entrada.SELECT)
             
         # 3. Lógica de Salida/Reinicio
-        if back_btn.value() == 0:
+        if boton == entrada.BACK:
             # El botón BACK se pulsó: sale de la función, terminando el bucle 'while should_run'
-            while back_btn.value() == 0:
-                utime.sleep_ms(50)
             should_run = False
             
-        elif select_btn.value() == 0:
+        else:
             # El botón SELECT se pulsó: el bucle 'while should_run' se repite, iniciando la grabación de nuevo
             oled.fill(0)
             oled.text("Reiniciando...", 0, 20, 1)
             oled.show()
-            # Esperar a que el botón se suelte para evitar la doble pulsación rápida
-            while select_btn.value() == 0:
-                utime.sleep_ms(50) 
             # El bucle 'should_run' se repite (go back to step 1)
 
     # Limpieza final al salir de la función
@@ -58,14 +77,129 @@ def run(oled, back_btn, select_btn, w, h, utime, math, random, framebuf):
     oled.show()
     
     
+def muestra_zocalos(oled, results):
+    """Resultado de cada zócalo entre las líneas 12 y 54 de la pantalla."""
+    if len(results) <= 4:
+        for i, r in enumerate(results):
+            oled.text(f"{i}: {r}"[:16], 0, 12 + i * 10, 1)
+        return
+    for i, r in enumerate(results[:8]):
+        estado = "OK" if r == "programmed" or r == "up to date" else "ERR"
+        oled.text(f"{i}:{estado}", (i // 4) * 64, 12 + (i % 4) * 10, 1)
+
+
+def muestra_tiempos(oled, rom):
+    """Guarda el resumen de tiempos del trabajo y lo deja en pantalla hasta pulsar un botón."""
+    tiempos.guarda(rom)
+    for linea in tiempos.resumen():
+        print(linea)
+    tiempos.muestra(oled)
+    entrada.servicio.espera_pulsacion(entrada.BACK, entrada.SELECT)
+
+
+def pinta_produccion(oled, rom, estado, ok, fallos, t0, utime):
+    oled.fill(0)
+    oled.text(rom.split("/")[-1][:16], 0, 1, 1)
+    oled.text(estado[:16], 0, 14, 1)
+    oled.text(f"OK:{ok} ERR:{fallos}"[:16], 0, 30, 1)
+    if t0 is not None and ok + fallos:
+        ms = max(1, utime.ticks_diff(utime.ticks_ms(), t0))
+        oled.text(f"{(ok + fallos) * 3600000 // ms} chips/h"[:16], 0, 40, 1)
+    oled.text("4-Salir", 0, 55, 1)
+    oled.show()
+
+
+def espera_chip(presente, utime):
+    """
+    Con presente, sondea hasta que todos los zócalos tengan chip; si no, hasta
+    que estén todos vacíos. Hace falta PRESENCE_CHECKS lecturas seguidas.
+    Devuelve False si se pulsa BACK mientras tanto.
+    """
+    objetivo = attiny.port.n if presente else 0
+    seguidas = 0
+    while seguidas < PRESENCE_CHECKS:
+        if entrada.es(entrada.servicio.evento(), entrada.BACK):
+            return False
+        seguidas = seguidas + 1 if chips_present() == objetivo else 0
+        utime.sleep_ms(PRODUCTION_POLL_MS)
+    return True
+
+
+def produccion(oled, rom, utime):
+    """
+    Modo producción: la ROM (y su .eep) se carga una sola vez y los chips se
+    graban en cuanto están colocados en todos los zócalos, sin pulsar nada.
+    OK/ERR y chips/h cuentan chips, no trabajos. Tras mostrar el resultado se
+    espera a que se retiren todos antes de armar de nuevo.
+    """
+    try:
+        image = load_rom(rom)
+        eeprom = load_eeprom(rom)
+    except (OSError, ValueError) as e:
+        print(f"Error leyendo {rom}: {e}")
+        pinta_produccion(oled, rom, "Error en la ROM", 0, 0, None, utime)
+        entrada.servicio.espera_pulsacion(entrada.BACK)
+        return
+
+    init_isp()
+    ok = fallos = 0
+    t0 = None
+    inserte = "Inserte chip" if attiny.port.n == 1 else f"Inserte {attiny.port.n} chips"
+    estado = inserte
+    # Con isp.timing los tiempos de todos los chips se suman y el resumen se
+    # guarda una sola vez al salir, no uno por chip
+    if attiny.TIMING:
+        tiempos.sesion(True)
+    try:
+        while True:
+            pinta_produccion(oled, rom, estado, ok, fallos, t0, utime)
+            if not espera_chip(True, utime):
+                return
+            if t0 is None:
+                t0 = utime.ticks_ms()
+
+            oled.fill(0)
+            oled.text("Grabando", 0, 1, 1)
+            oled.text(rom.split("/")[-1][:16], 0, 9, 1)
+            if program_flash(image, oled, eeprom):
+                record_device(image, rom)
+            malos = [str(i) for i, r in enumerate(attiny.port.results)
+                     if r != "programmed" and r != "up to date"]
+            fallos += len(malos)
+            ok += attiny.port.n - len(malos)
+            if not malos:
+                estado = "OK - Retire"
+            elif attiny.port.n == 1:
+                estado = "FALLO - Retire"
+            else:
+                estado = "FALLO " + ",".join(malos)
+            print(f"Produccion: {ok} OK, {fallos} fallos")
+
+            pinta_produccion(oled, rom, estado, ok, fallos, t0, utime)
+            if not espera_chip(False, utime):
+                return
+            estado = inserte
+    finally:
+        if attiny.TIMING:
+            tiempos.sesion(False)
+            if ok + fallos:
+                lineas = tiempos.resumen_sesion()
+                tiempos.guarda(f"{rom} ({ok + fallos} chips)", lineas=lineas)
+                for linea in lineas:
+                    print(linea)
+
+
 def flashea_attiny(filepath,oled):
-    global hex_file_content
-    
-    with open(filepath, 'r') as f:
-        hex_file_content = f.read()
+    try:
+        image = load_rom(filepath)
+        eeprom = load_eeprom(filepath)
+    except (OSError, ValueError) as e:
+        print(f"Error leyendo {filepath}: {e}")
+        return False
     init_isp()
     print("Starting ATtiny13 programming with 9.6 MHz clock configuration...")
-    if program_flash(hex_file_content,oled):
+    if program_flash(image,oled,eeprom):
+        record_device(image, filepath)
         print("ATtiny13 programming + verification successful!")
         print("Chip is now configured to run at 9.6 MHz internal clock.")
         return True
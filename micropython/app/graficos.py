@@ -0,0 +1,53 @@
+# Mapas de bits precalculados para la pantalla.
+#
+# Los dibujos que se repiten (la barra de damero, el logo) se calculan una vez
+# en un Bitmap y luego se pintan con blit(), que es una sola llamada nativa en
+# vez de miles de oled.pixel() interpretados.
+
+import framebuf
+
+
+class Bitmap(framebuf.FrameBuffer):
+    """
+    FrameBuffer MONO_VLSB que recuerda su tamaño: el driver del OLED lo usa
+    al hacer blit para refrescar solo esa zona.
+    """
+
+    def __init__(self, width, height, buffer=None, stride=None):
+        self.width = width
+        self.height = height
+        self.stride = stride or width
+        self.buffer = buffer if buffer is not None else bytearray(((height + 7) // 8) * self.stride)
+        super().__init__(self.buffer, width, height, framebuf.MONO_VLSB, self.stride)
+
+    def recorte(self, width):
+        """Vista de las primeras width columnas, sin copiar el buffer."""
+        return Bitmap(min(width, self.width), self.height, self.buffer, self.stride)
+
+
+def damero(width, height, fase=0):
+    """
+    Damero de 1 píxel: encendido donde (x + y + fase) es par, igual que si
+    se pintase en pantalla con x + y par cuando fase es la paridad del origen.
+    """
+    bmp = Bitmap(width, height)
+    buf = bmp.buffer
+    for p in range((height + 7) // 8):
+        base = p * width
+        for i in range(width):
+            buf[base + i] = 0x55 if (i + fase) % 2 == 0 else 0xAA
+    return bmp
+
+
+_dameros = {}
+
+def blit_damero(oled, x, y, w, h):
+    """Pinta w x h del damero en (x, y). El Bitmap se calcula una vez por alto y paridad."""
+    if w <= 0 or h <= 0:
+        return
+    key = (h, (x + y) % 2)
+    bmp = _dameros.get(key)
+    if bmp is None or bmp.width < w:
+        bmp = damero(max(w, 128), h, key[1])
+        _dameros[key] = bmp
+    oled.blit(bmp.recorte(w), x, y)
@@ -0,0 +1,425 @@
+# Imagen de memoria compacta para el grabador.
+#
+# En vez de un dict {dirección: byte}, la imagen es un bytearray del tamaño del
+# chip (relleno con 0xFF, igual que la flash borrada) más un mapa de bits con
+# las páginas que contienen datos. Grabar y verificar trabajan por páginas.
+
+import ubinascii
+import ustruct
+import uos
+from app.dispositivos import MAX_FLASH_SIZE, MAX_PAGE_SIZE, MIN_PAGE_SIZE
+
+
+class FlashImage:
+    def __init__(self, size, page_size):
+        self.size = size
+        self.page_size = page_size
+        self.data = bytearray(b"\xff" * size)
+        self.page_map = bytearray((size // page_size + 7) // 8)
+        self.min_addr = -1
+        self.max_addr = -1
+        self.count = 0      # Bytes de datos cargados
+        self.signature = None  # Firma del chip al que corresponde, si se sabe
+        self._mv = memoryview(self.data)
+
+    def __len__(self):
+        return self.count
+
+    def put(self, addr, buf):
+        """Copia buf en la dirección addr y marca las páginas afectadas."""
+        n = len(buf)
+        if n == 0:
+            return
+        end = addr + n
+        if addr < 0 or end > self.size:
+            raise ValueError(f"address 0x{addr:04X} out of image (0x{self.size:04X} bytes)")
+        self._mv[addr:end] = buf
+        for p in range(addr // self.page_size, (end - 1) // self.page_size + 1):
+            self.page_map[p >> 3] |= 1 << (p & 7)
+        if self.min_addr < 0 or addr < self.min_addr:
+            self.min_addr = addr
+        if end - 1 > self.max_addr:
+            self.max_addr = end - 1
+        self.count += n
+
+    def has_page(self, p):
+        return self.page_map[p >> 3] & (1 << (p & 7)) != 0
+
+    def page_numbers(self):
+        """Números de las páginas con datos, en orden."""
+        if self.count == 0:
+            return
+        for p in range(self.min_addr // self.page_size, self.max_addr // self.page_size + 1):
+            if self.page_map[p >> 3] & (1 << (p & 7)):
+                yield p
+
+    def page_count(self):
+        n = 0
+        for _ in self.page_numbers():
+            n += 1
+        return n
+
+    def set_page_size(self, page_size):
+        """
+        Cambia el tamaño de página (al conocer el chip) recalculando el mapa:
+        una página nueva tiene datos si solapa con alguna que los tenía.
+        """
+        if page_size == self.page_size:
+            return
+        old = self.page_size
+        page_map = bytearray((self.size // page_size + 7) // 8)
+        for p in list(self.page_numbers()):
+            start = p * old
+            for q in range(start // page_size, (start + old - 1) // page_size + 1):
+                page_map[q >> 3] |= 1 << (q & 7)
+        self.page_size = page_size
+        self.page_map = page_map
+
+    def page(self, p):
+        """Vista (sin copia) de los bytes de la página p."""
+        start = p * self.page_size
+        return self._mv[start:start + self.page_size]
+
+
+# -------------------------------------------------------------------
+# Lectura de Intel HEX en streaming
+# -------------------------------------------------------------------
+
+# El .hex se lee por bloques con readinto() sobre buffers preasignados y cada
+# registro se decodifica en su sitio: ni el archivo ni cada línea se copian en
+# objetos nuevos (readline()/unhexlify() reservaban uno por registro).
+HEX_CHUNK = 256
+_HEX_REC_MAX = 255 + 5                 # LL AAAA TT datos CC
+_hex_buf = bytearray(HEX_CHUNK)
+_hex_line = bytearray(2 * _HEX_REC_MAX)  # Dígitos de un registro, sin ':'
+_hex_rec = bytearray(_HEX_REC_MAX)
+_hex_rec_mv = memoryview(_hex_rec)
+
+# Valor de cada carácter ASCII como dígito hexadecimal; 0x10 si no lo es
+_HEX_VAL = bytearray(b"\x10" * 256)
+for _i in range(10):
+    _HEX_VAL[0x30 + _i] = _i
+for _i in range(6):
+    _HEX_VAL[0x41 + _i] = 10 + _i
+    _HEX_VAL[0x61 + _i] = 10 + _i
+
+
+def _record(line, n, image, base, line_no):
+    """
+    Decodifica en _hex_rec los n dígitos de line (un registro sin ':') y lo
+    aplica a image. Valida la suma y admite direcciones extendidas de
+    segmento (02) y lineales (04). Devuelve la base de direcciones que queda,
+    o -1 si es el registro EOF.
+    """
+    if n & 1 or n < 10 or n > 2 * _HEX_REC_MAX:
+        raise ValueError(f"line {line_no}: bad record length")
+    rec = _hex_rec
+    val = _HEX_VAL
+    size = n >> 1
+    total = 0
+    for i in range(size):
+        hi = val[line[2 * i]]
+        lo = val[line[2 * i + 1]]
+        if (hi | lo) & 0x10:
+            raise ValueError(f"line {line_no}: invalid hex digits")
+        b = (hi << 4) | lo
+        rec[i] = b
+        total += b
+    if size != rec[0] + 5:
+        raise ValueError(f"line {line_no}: bad record length")
+    if total & 0xFF:
+        raise ValueError(f"line {line_no}: checksum error")
+    record_type = rec[3]
+    if record_type == 0:    # Datos
+        image.put(base + ((rec[1] << 8) | rec[2]), _hex_rec_mv[4:4 + rec[0]])
+    elif record_type == 1:  # EOF
+        return -1
+    elif record_type == 2:  # Dirección extendida de segmento
+        return ((rec[4] << 8) | rec[5]) << 4
+    elif record_type == 4:  # Dirección extendida lineal
+        return ((rec[4] << 8) | rec[5]) << 16
+    # 03/05 (dirección de arranque) no aplican a un ATtiny
+    return base
+
+
+def load_hex_lines(lines, image):
+    """Decodifica registros Intel HEX (líneas en bytes ya en memoria) en image."""
+    base = 0
+    line_no = 0
+    for line in lines:
+        line_no += 1
+        line = line.strip()
+        if not line or line[0] != 0x3A:  # ':'
+            continue
+        base = _record(memoryview(line)[1:], len(line) - 1, image, base, line_no)
+        if base < 0:
+            break
+    return image
+
+
+def load_hex(filepath, image):
+    """Carga un .hex por bloques sin leer nunca el archivo entero en memoria."""
+    buf = _hex_buf
+    line = _hex_line
+    limit = len(line)
+    base = 0
+    line_no = 1
+    n = -1  # Dígitos del registro en curso; -1 fuera de un registro
+    with open(filepath, 'rb') as f:
+        while True:
+            got = f.readinto(buf)
+            if not got:
+                break
+            for i in range(got):
+                c = buf[i]
+                if c == 0x0A:    # '\n'
+                    if n > 0:
+                        base = _record(line, n, image, base, line_no)
+                        if base < 0:
+                            return image
+                    n = -1
+                    line_no += 1
+                elif c == 0x3A:  # ':'
+                    n = 0
+                elif n >= 0 and c > 0x20:  # Sin '\r' ni espacios
+                    if n == limit:
+                        raise ValueError(f"line {line_no}: bad record length")
+                    line[n] = c
+                    n += 1
+    if n > 0:  # Última línea sin '\n'
+        _record(line, n, image, base, line_no)
+    return image
+
+
+EEPROM_EXT = ".eep"
+
+
+def eeprom_path(filepath):
+    """El .eep con la EEPROM que acompaña a una ROM: /roms/juego.hex -> /roms/juego.eep"""
+    dot = filepath.rfind(".")
+    return (filepath[:dot] if dot > filepath.rfind("/") else filepath) + EEPROM_EXT
+
+
+# -------------------------------------------------------------------
+# Caché binaria (sidecar) de las ROMs
+# -------------------------------------------------------------------
+#
+# Junto a cada ROM de /roms se guarda en /cache/<nombre>.img la imagen ya
+# decodificada, alineada a página, para que grabar sea solo leer un archivo:
+#   cabecera | mapa de páginas | datos (size bytes)
+# Solo se guarda desde 0 hasta la última página con datos, no la flash del
+# chip más grande: la caché de una ROM de 1 KB ocupa poco más de 1 KB.
+# La cabecera lleva el tamaño y la fecha del archivo de origen (si cambian, la
+# caché se regenera), la firma del dispositivo y un CRC32 de mapa + datos.
+# La firma es la del chip del que se leyó la ROM o en el que ya se ha grabado;
+# un .hex recién decodificado no la sabe y lleva NO_SIGNATURE.
+
+CACHE_PATH = "/cache"
+CACHE_MAGIC = b"ATWI"
+CACHE_VERSION = 3  # 3: size es lo guardado, no el tamaño de la imagen
+# magic, versión, firma, page_size, size, src_size, src_mtime, crc32, count, min_addr, max_addr
+CACHE_HEADER = "<4sB3sHHIIIIii"
+CACHE_HEADER_SIZE = ustruct.calcsize(CACHE_HEADER)
+
+# Geometría de las imágenes: cabe la flash de cualquier chip del registro
+# (app/dispositivos.py) y la página se ajusta al grabar con set_page_size()
+DEFAULT_SIZE = MAX_FLASH_SIZE
+DEFAULT_PAGE_SIZE = MIN_PAGE_SIZE
+NO_SIGNATURE = b"\x00\x00\x00"
+
+
+def cache_path(filepath):
+    return CACHE_PATH + "/" + filepath.split("/")[-1] + ".img"
+
+
+def _source_stamp(filepath):
+    st = uos.stat(filepath)
+    return st[6], st[8]
+
+
+def _crc(page_map, data):
+    return ubinascii.crc32(data, ubinascii.crc32(page_map)) & 0xFFFFFFFF
+
+
+def _used_size(image):
+    """
+    Bytes de la imagen hasta la última página con datos, redondeado a
+    MAX_PAGE_SIZE para que set_page_size() siga cuadrando con cualquier chip.
+    """
+    if image.max_addr < 0:
+        return 0
+    return min(image.size, (image.max_addr // MAX_PAGE_SIZE + 1) * MAX_PAGE_SIZE)
+
+
+def save_cache(image, filepath):
+    """Escribe la caché binaria de la ROM filepath a partir de su imagen (y su firma)."""
+    src_size, src_mtime = _source_stamp(filepath)
+    signature = image.signature if image.signature is not None else NO_SIGNATURE
+    size = _used_size(image)
+    page_map = memoryview(image.page_map)[:(size // image.page_size + 7) // 8]
+    data = memoryview(image.data)[:size]
+    try:
+        uos.mkdir(CACHE_PATH)
+    except OSError:
+        pass
+    header = ustruct.pack(CACHE_HEADER, CACHE_MAGIC, CACHE_VERSION, bytes(signature),
+                          image.page_size, size, src_size, src_mtime, _crc(page_map, data),
+                          image.count, image.min_addr, image.max_addr)
+    with open(cache_path(filepath), 'wb') as f:
+        f.write(header)
+        f.write(page_map)
+        f.write(data)
+
+
+def load_cache(filepath):
+    """
+    Devuelve (imagen, firma) desde la caché de filepath, o None si no existe,
+    está desactualizada respecto al archivo de origen o no pasa el CRC. La
+    imagen solo llega hasta la última página con datos.
+    """
+    try:
+        src_size, src_mtime = _source_stamp(filepath)
+        with open(cache_path(filepath), 'rb') as f:
+            header = f.read(CACHE_HEADER_SIZE)
+            if len(header) != CACHE_HEADER_SIZE:
+                return None
+            (magic, version, signature, page_size, size, c_size, c_mtime, crc,
+             count, min_addr, max_addr) = ustruct.unpack(CACHE_HEADER, header)
+            if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                return None
+            if c_size != src_size or c_mtime != src_mtime:
+                return None
+            image = FlashImage(size, page_size)
+            if f.readinto(image.page_map) != len(image.page_map):
+                return None
+            if f.readinto(image.data) != size:
+                return None
+    except OSError:
+        return None
+    if _crc(image.page_map, image.data) != crc:
+        return None
+    image.count = count
+    image.min_addr = min_addr
+    image.max_addr = max_addr
+    if signature != NO_SIGNATURE:
+        image.signature = signature
+    return image, signature
+
+
+def build_cache(filepath, size=DEFAULT_SIZE, page_size=DEFAULT_PAGE_SIZE):
+    """Decodifica la ROM filepath y guarda su caché (sin firma). Devuelve la imagen."""
+    image = load_hex(filepath, FlashImage(size, page_size))
+    save_cache(image, filepath)
+    return image
+
+
+def remove_cache(filepath):
+    try:
+        uos.remove(cache_path(filepath))
+    except OSError:
+        pass
+
+
+# -------------------------------------------------------------------
+# Volcados binarios (.bin y .binz)
+# -------------------------------------------------------------------
+#
+# Alternativa compacta al .hex para guardar volcados de chips:
+#   cabecera | datos (en .binz comprimidos con deflate, formato zlib)
+# La cabecera lleva la firma, los fuses y lock bits leídos, la longitud útil y
+# el CRC32 de los datos sin comprimir. Un .bin sin cabecera (p. ej. de
+# avr-objcopy) también se acepta y se carga desde la dirección 0.
+
+DUMP_EXT = ".bin"
+DUMPZ_EXT = ".binz"
+DUMP_MAGIC = b"ATWD"
+DUMP_VERSION = 1
+DUMP_COMPRESSED = 0x01
+# magic, versión, flags, firma, fuse bajo, fuse alto, lock bits, longitud, crc32
+DUMP_HEADER = "<4sBB3sBBBII"
+DUMP_HEADER_SIZE = ustruct.calcsize(DUMP_HEADER)
+DUMP_CHUNK = 256
+
+# deflate (MicroPython >= 1.21) comprime y descomprime; con el antiguo uzlib
+# solo se pueden leer los .binz
+try:
+    import deflate
+except ImportError:
+    deflate = None
+
+
+def is_dump(filepath):
+    return filepath.endswith(DUMP_EXT) or filepath.endswith(DUMPZ_EXT)
+
+
+def can_compress():
+    return deflate is not None
+
+
+def save_dump(filepath, data, length, signature, fuses, compress=False):
+    """
+    Guarda los length primeros bytes de data como volcado binario. fuses es
+    (bajo, alto, lock). Con compress los datos van comprimidos con deflate.
+    """
+    src = memoryview(data)[:length]
+    header = ustruct.pack(DUMP_HEADER, DUMP_MAGIC, DUMP_VERSION,
+                          DUMP_COMPRESSED if compress else 0, bytes(signature),
+                          fuses[0], fuses[1], fuses[2], length,
+                          ubinascii.crc32(src) & 0xFFFFFFFF)
+    with open(filepath, 'wb') as f:
+        f.write(header)
+        if compress:
+            z = deflate.DeflateIO(f, deflate.ZLIB)
+            z.write(src)
+            z.close()
+        else:
+            f.write(src)
+
+
+def _decompressor(f):
+    if deflate is not None:
+        return deflate.DeflateIO(f, deflate.ZLIB)
+    import uzlib
+    return uzlib.DecompIO(f, 15)
+
+
+def load_dump(filepath, image):
+    """
+    Carga un volcado .bin/.binz en image por bloques, comprobando el CRC.
+    Devuelve (imagen, cabecera), con cabecera = (firma, bajo, alto, lock) o
+    None si el archivo es un binario sin cabecera.
+    """
+    with open(filepath, 'rb') as f:
+        header = f.read(DUMP_HEADER_SIZE)
+        info = None
+        length = None
+        stream = f
+        if len(header) == DUMP_HEADER_SIZE and header[:4] == DUMP_MAGIC:
+            (magic, version, flags, signature, low, high, lock,
+             length, crc) = ustruct.unpack(DUMP_HEADER, header)
+            if version != DUMP_VERSION:
+                raise ValueError(f"dump version {version} not supported")
+            info = (signature, low, high, lock)
+            image.signature = signature
+            if flags & DUMP_COMPRESSED:
+                stream = _decompressor(f)
+        else:
+            f.seek(0)
+        buf = bytearray(DUMP_CHUNK)
+        addr = 0
+        check = 0
+        while length is None or addr < length:
+            want = DUMP_CHUNK if length is None else min(DUMP_CHUNK, length - addr)
+            n = stream.readinto(memoryview(buf)[:want])
+            if not n:
+                break
+            chunk = memoryview(buf)[:n]
+            image.put(addr, chunk)
+            check = ubinascii.crc32(chunk, check)
+            addr += n
+    if info is not None:
+        if addr != length:
+            raise ValueError(f"dump truncated: {addr} of {length} bytes")
+        if check & 0xFFFFFFFF != crc:
+            raise ValueError("dump CRC error")
+    return image, info
@@ -0,0 +1,323 @@
+# Transportes ISP: la capa que mueve los bytes entre el ESP32 y el ATtiny.
+#
+# Todos los transportes exponen la misma interfaz, que es lo único que usa
+# IspPort en app/attiny.py:
+#   transfer(tx, rx, ...) -> envía tx y guarda en rx lo recibido (mismo tamaño);
+#                            con varios zócalos, un rx por cada MISO
+#   write(tx)             -> envía tx descartando la respuesta
+#   idle()                -> deja SCK y MOSI en reposo (nivel bajo)
+#   set_speed(hz)         -> frecuencia de SCK; None vuelve a la configurada
+#
+# Solo el bit-bang portable y el simulado admiten varios MISO (gang).
+#
+# El transporte se elige en app/config.json, sección "isp":
+#   {"transport": "bitbang" | "native" | "spi" | "softspi" | "fake", "baudrate": 100000}
+
+import machine
+import time
+
+SCK_DELAY_US = 1     # Semiperiodo de SCK en bit-bang
+SPI_BAUDRATE = 100000
+SPI_BUS = 1          # En el ESP32-C3 el único SPI de propósito general es el 1
+
+
+class BitBangTransport:
+    """
+    Transporte por software: cada bit se genera con llamadas a Pin.
+    miso_pins es una lista: con más de un pin, SCK/MOSI se comparten y cada
+    bit se lee de todos los zócalos a la vez.
+    """
+
+    def __init__(self, sck_pin, mosi_pin, miso_pins, delay_us=SCK_DELAY_US):
+        self.sck = machine.Pin(sck_pin, machine.Pin.OUT)
+        self.mosi = machine.Pin(mosi_pin, machine.Pin.OUT)
+        self.misos = [machine.Pin(p, machine.Pin.IN, machine.Pin.PULL_UP) for p in miso_pins]
+        self.miso = self.misos[0]
+        self.delay_us = delay_us
+        self.config_delay_us = delay_us
+
+    def set_speed(self, hz):
+        # El intérprete ya limita la velocidad real; solo se ajusta la espera
+        self.delay_us = self.config_delay_us if hz is None else max(0, 500000 // hz)
+
+    def transfer_byte(self, byte):
+        sck = self.sck
+        mosi = self.mosi
+        miso = self.miso
+        delay_us = self.delay_us
+        read_val = 0
+        for i in range(8):
+            mosi.value((byte >> (7 - i)) & 0x01)
+            time.sleep_us(delay_us) # Necesario para SCK LOW time
+            sck.value(1) # Ascendente
+            read_val = (read_val << 1) | miso.value()
+            time.sleep_us(delay_us) # Necesario para SCK HIGH time
+            sck.value(0) # Descendente
+        return read_val
+
+    def transfer(self, tx, *rxs):
+        if len(rxs) == 1:
+            rx = rxs[0]
+            transfer_byte = self.transfer_byte
+            for i in range(len(tx)):
+                rx[i] = transfer_byte(tx[i])
+            return
+        sck = self.sck
+        mosi = self.mosi
+        misos = self.misos
+        delay_us = self.delay_us
+        n = len(rxs)
+        vals = [0] * n
+        for i in range(len(tx)):
+            byte = tx[i]
+            for k in range(n):
+                vals[k] = 0
+            for bit in range(8):
+                mosi.value((byte >> (7 - bit)) & 0x01)
+                time.sleep_us(delay_us)
+                sck.value(1)
+                for k in range(n):
+                    vals[k] = (vals[k] << 1) | misos[k].value()
+                time.sleep_us(delay_us)
+                sck.value(0)
+            for k in range(n):
+                rxs[k][i] = vals[k]
+
+    def write(self, tx):
+        transfer_byte = self.transfer_byte
+        for byte in tx:
+            transfer_byte(byte)
+
+    def idle(self):
+        self.sck.value(0)
+        self.mosi.value(0)
+
+
+class SpiTransport:
+    """Transporte con machine.SPI (o SoftSPI): el reloj lo genera el periférico."""
+
+    def __init__(self, sck_pin, mosi_pin, miso_pin, baudrate=SPI_BAUDRATE, bus=SPI_BUS, soft=False):
+        sck = machine.Pin(sck_pin)
+        mosi = machine.Pin(mosi_pin)
+        miso = machine.Pin(miso_pin)
+        self.baudrate = baudrate
+        if soft:
+            self.spi = machine.SoftSPI(baudrate=baudrate, polarity=0, phase=0,
+                                       sck=sck, mosi=mosi, miso=miso)
+        else:
+            self.spi = machine.SPI(bus, baudrate=baudrate, polarity=0, phase=0, bits=8,
+                                   firstbit=machine.SPI.MSB, sck=sck, mosi=mosi, miso=miso)
+
+    def set_speed(self, hz):
+        self.spi.init(baudrate=self.baudrate if hz is None else hz)
+
+    def transfer(self, tx, rx):
+        self.spi.write_readinto(tx, rx)
+
+    def write(self, tx):
+        self.spi.write(tx)
+
+    def idle(self):
+        # En modo 0 el periférico ya deja SCK en bajo entre transferencias
+        pass
+
+
+class FakeTarget:
+    """
+    ATtiny simulado en memoria para probar el motor ISP sin hardware.
+    También hace de pin RESET (método value), así que se puede pasar
+    directamente donde el motor espera un machine.Pin.
+    """
+
+    def __init__(self, signature=(0x1E, 0x90, 0x07), flash_size=1024, page_size=32,
+                 low_fuse=0x6A, high_fuse=0xFF, lock_bits=0xFF, busy_polls=3,
+                 eeprom_size=64, eeprom_page=4):
+        self.signature = bytes(signature)
+        self.flash = bytearray(b"\xff" * flash_size)
+        self.page_size = page_size
+        self.page = bytearray(b"\xff" * page_size)
+        self.eeprom = bytearray(b"\xff" * eeprom_size)
+        self.eeprom_page = eeprom_page
+        self.eeprom_buf = {}  # Posición -> byte cargado con 0xC1
+        self.low_fuse = low_fuse
+        self.high_fuse = high_fuse
+        self.lock_bits = lock_bits
+        self.rst = 1
+        self.enabled = False
+        self.busy_polls = busy_polls  # Sondeos RDY/BSY que tarda cada escritura
+        self.busy = 0
+        self.max_sck = 0
+        self.sync_lost = False  # Un SCK demasiado rápido descoloca los bits hasta el siguiente RESET
+
+    def _latch_clock(self):
+        # Oscilador interno de 9.6 MHz, dividido por 8 si CKDIV8 (bit 4) está programado.
+        # Los fuses nuevos solo se aplican tras un reset, como en el chip real.
+        f_cpu = 9600000 if self.low_fuse & 0x10 else 1200000
+        self.max_sck = f_cpu // 4
+
+    def value(self, v=None):
+        if v is None:
+            return self.rst
+        self.rst = v
+        if v:
+            self.enabled = False
+            self.sync_lost = False
+
+    def command(self, a, b, c, d):
+        """Ejecuta una instrucción ISP y devuelve el byte que sale en la 4ª posición."""
+        if a == 0xAC and b == 0x53:
+            if not self.enabled:
+                self._latch_clock()
+            self.enabled = True
+            return 0x00
+        if a == 0xAC:
+            self.busy = self.busy_polls
+            if b == 0x80:
+                for i in range(len(self.flash)):
+                    self.flash[i] = 0xFF
+                for i in range(len(self.eeprom)):
+                    self.eeprom[i] = 0xFF
+                self.lock_bits = 0xFF
+            elif b == 0xA0:
+                self.low_fuse = d
+            elif b == 0xA8:
+                self.high_fuse = d
+            elif b == 0xE0:
+                self.lock_bits = d
+            return d
+        if a == 0x30:
+            return self.signature[c & 0x03] if (c & 0x03) < 3 else 0xFF
+        if a == 0x50:
+            return self.low_fuse
+        if a == 0x58:
+            return self.high_fuse if b == 0x08 else self.lock_bits
+        words = self.page_size // 2
+        if a == 0x40 or a == 0x48:
+            self.page[(c % words) * 2 + (1 if a == 0x48 else 0)] = d
+            return d
+        if a == 0x4C:
+            base = (((b << 8) | c) * 2) & ~(self.page_size - 1)
+            for i in range(self.page_size):
+                # La flash solo puede pasar bits de 1 a 0 sin borrado previo
+                self.flash[base + i] &= self.page[i]
+                self.page[i] = 0xFF
+            self.busy = self.busy_polls
+            return 0x00
+        if a == 0x20 or a == 0x28:
+            addr = (((b << 8) | c) * 2) + (1 if a == 0x28 else 0)
+            return self.flash[addr] if addr < len(self.flash) else 0xFF
+        if a == 0xA0:
+            addr = (b << 8) | c
+            return self.eeprom[addr] if addr < len(self.eeprom) else 0xFF
+        if a == 0xC0:
+            self.eeprom[((b << 8) | c) % len(self.eeprom)] = d
+            self.busy = self.busy_polls
+            return d
+        if a == 0xC1:
+            self.eeprom_buf[c % self.eeprom_page] = d
+            return d
+        if a == 0xC2:
+            # Solo cambian las posiciones cargadas; el resto de la página se conserva
+            base = ((b << 8) | c) & ~(self.eeprom_page - 1)
+            for k, v in self.eeprom_buf.items():
+                self.eeprom[(base + k) % len(self.eeprom)] = v
+            self.eeprom_buf = {}
+            self.busy = self.busy_polls
+            return 0x00
+        if a == 0xF0:
+            if self.busy:
+                self.busy -= 1
+                return 0x01
+            return 0x00
+        return 0x00
+
+
+class FakeTransport:
+    """
+    Transporte en memoria conectado a uno o varios FakeTarget (uno por zócalo).
+    Trabaja en bloques de 4 bytes.
+    """
+
+    def __init__(self, targets=None):
+        self.targets = targets if targets else [FakeTarget()]
+        self.target = self.targets[0]
+        self.speed = SPI_BAUDRATE
+
+    def set_speed(self, hz):
+        self.speed = SPI_BAUDRATE if hz is None else hz
+
+    def transfer(self, tx, *rxs):
+        for k in range(len(rxs)):
+            self._transfer_one(self.targets[k], tx, rxs[k])
+
+    def _transfer_one(self, target, tx, rx):
+        for i in range(0, len(tx), 4):
+            a, b, c, d = tx[i], tx[i + 1], tx[i + 2], tx[i + 3]
+            if target.rst or not (target.enabled or (a == 0xAC and b == 0x53)):
+                # Sin chip en modo programación MISO queda en alto (pull-up)
+                rx[i] = rx[i + 1] = rx[i + 2] = rx[i + 3] = 0xFF
+                continue
+            if target.enabled and self.speed > target.max_sck:
+                # SCK demasiado rápido para el reloj del chip: se pierde la sincronía
+                target.sync_lost = True
+            if target.sync_lost:
+                # Como en el chip real, solo un pulso de RESET y un nuevo
+                # Programming Enable la recuperan
+                rx[i] = rx[i + 1] = rx[i + 2] = rx[i + 3] = 0x00
+                continue
+            # En sincronía el chip devuelve el eco del byte anterior
+            rx[i] = 0x00
+            rx[i + 1] = a
+            rx[i + 2] = b
+            rx[i + 3] = target.command(a, b, c, d)
+
+    def write(self, tx):
+        self.transfer(tx, bytearray(len(tx)))
+
+    def idle(self):
+        pass
+
+
+def crea_transporte(opciones, sck_pin, mosi_pin, miso_pins):
+    """
+    Construye el transporte indicado en la sección "isp" de la configuración.
+    miso_pins tiene un pin por zócalo.
+    """
+    tipo = opciones.get("transport", "bitbang")
+    if len(miso_pins) > 1 and tipo not in ("bitbang", "fake"):
+        print(f"Transport '{tipo}' has a single MISO, using bit-bang for {len(miso_pins)} sockets.")
+        tipo = "bitbang"
+    miso_pin = miso_pins[0]
+    if tipo == "spi" or tipo == "softspi":
+        return SpiTransport(sck_pin, mosi_pin, miso_pin,
+                            baudrate=opciones.get("baudrate", SPI_BAUDRATE),
+                            bus=opciones.get("spi_bus", SPI_BUS),
+                            soft=(tipo == "softspi"))
+    if tipo == "fake":
+        return FakeTransport([FakeTarget() for _ in miso_pins])
+    bitbang = BitBangTransport(sck_pin, mosi_pin, miso_pins,
+                               delay_us=opciones.get("sck_delay_us", SCK_DELAY_US))
+    if tipo == "native":
+        try:
+            from app.isp_viper import NativeTransport
+            return NativeTransport(sck_pin, mosi_pin, miso_pin, bitbang,
+                                   base=opciones.get("gpio_base"))
+        except Exception as e:
+            print(f"Native ISP engine not available ({e}), using bit-bang.")
+    return bitbang
+
+
+def self_check(rapido, referencia, tx):
+    """Envía el mismo flujo de comandos (solo lecturas) por los dos transportes y compara."""
+    rx_rapido = bytearray(len(tx))
+    rx_referencia = bytearray(len(tx))
+    rapido.transfer(tx, rx_rapido)
+    referencia.transfer(tx, rx_referencia)
+    return rx_rapido == rx_referencia
+
+
+def crea_resets(transporte, reset_pins):
+    """Pines RESET de los zócalos. Con el transporte simulado, los propios chips falsos."""
+    if isinstance(transporte, FakeTransport):
+        return transporte.targets
+    return [machine.Pin(p, machine.Pin.OUT) for p in reset_pins]
@@ -0,0 +1,110 @@
+# Motor bit-bang compilado con @micropython.viper.
+#
+# Escribe directamente en los registros GPIO_OUT_W1TS/W1TC y lee GPIO_IN del
+# ESP32, y envía o recibe buffers completos en una sola llamada. Está en un
+# módulo aparte porque si el firmware no trae el emisor viper la importación
+# falla, y entonces app/isp.py se queda con el BitBangTransport portable.
+
+import micropython
+from micropython import const
+import machine
+import os
+from array import array
+
+# Base del bloque GPIO según el chip (los offsets de los registros coinciden)
+GPIO_BASES = {
+    "ESP32": 0x3FF44000,
+    "ESP32S2": 0x3F404000,
+    "ESP32S3": 0x60004000,
+    "ESP32C3": 0x60004000,
+}
+GPIO_OUT_W1TS = const(0x08)
+GPIO_OUT_W1TC = const(0x0C)
+GPIO_IN = const(0x3C)
+
+DELAY_LOOPS = 2   # Vueltas de espera activa por semiperiodo de SCK
+LOOPS_PER_US = 20 # Aproximado para un núcleo a 160 MHz
+
+# Posiciones en el array de parámetros de _transfer(): las versiones antiguas
+# de MicroPython solo admiten 4 argumentos en una función viper
+P_BASE = const(0)
+P_SCK = const(1)
+P_MOSI = const(2)
+P_MISO = const(3)
+P_DELAY = const(4)
+
+
+def gpio_base():
+    """Dirección del bloque GPIO del chip actual, o None si no se conoce."""
+    chip = os.uname().machine.split(" with ")[-1].replace("-", "").strip()
+    return GPIO_BASES.get(chip)
+
+
+@micropython.viper
+def _transfer(tx: ptr8, rx: ptr8, n: int, params: ptr32):
+    base = params[P_BASE]
+    sck = params[P_SCK]
+    mosi = params[P_MOSI]
+    miso = params[P_MISO]
+    delay = params[P_DELAY]
+    w1ts = ptr32(base + GPIO_OUT_W1TS)
+    w1tc = ptr32(base + GPIO_OUT_W1TC)
+    gin = ptr32(base + GPIO_IN)
+    for i in range(n):
+        out = int(tx[i])
+        val = 0
+        for bit in range(8):
+            if out & 0x80:
+                w1ts[0] = mosi
+            else:
+                w1tc[0] = mosi
+            out = out << 1
+            d = delay
+            while d > 0:
+                d -= 1
+            w1ts[0] = sck  # Ascendente: el chip muestrea MOSI
+            val = val << 1
+            if int(gin[0]) & miso:
+                val = val | 1
+            d = delay
+            while d > 0:
+                d -= 1
+            w1tc[0] = sck  # Descendente
+        rx[i] = val
+
+
+class NativeTransport:
+    """
+    Transporte bit-bang nativo. reference es el BitBangTransport sobre los
+    mismos pines, usado por la autocomprobación y como respaldo.
+    """
+
+    def __init__(self, sck_pin, mosi_pin, miso_pin, reference, base=None, delay=DELAY_LOOPS):
+        self.base = base if base is not None else gpio_base()
+        if self.base is None:
+            raise OSError("GPIO base unknown for " + os.uname().machine)
+        # Los Pin dejan configurado el IO MUX; a partir de ahí se usan los registros
+        self.sck = machine.Pin(sck_pin, machine.Pin.OUT, value=0)
+        self.mosi = machine.Pin(mosi_pin, machine.Pin.OUT, value=0)
+        self.miso = machine.Pin(miso_pin, machine.Pin.IN, machine.Pin.PULL_UP)
+        # Base, máscaras de SCK/MOSI/MISO y espera, en el orden de P_*
+        self.params = array('I', [self.base, 1 << sck_pin, 1 << mosi_pin, 1 << miso_pin, delay])
+        self.config_delay = delay
+        self.reference = reference
+        self._scratch = bytearray(0)
+
+    def set_speed(self, hz):
+        self.params[P_DELAY] = self.config_delay if hz is None else max(0, LOOPS_PER_US * 500000 // hz)
+        self.reference.set_speed(hz)
+
+    def transfer(self, tx, rx):
+        _transfer(tx, rx, len(tx), self.params)
+
+    def write(self, tx):
+        if len(self._scratch) < len(tx):
+            self._scratch = bytearray(len(tx))
+        self.transfer(tx, self._scratch)
+
+    def idle(self):
+        self.sck.value(0)
+        self.mosi.value(0)
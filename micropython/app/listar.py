@@ -3,6 +3,8 @@ import utime
 import gc
 import sys
 import app.cfg as cfg
+import app.imagen as imagen
+import app.entrada as entrada
 from machine import reset
 
 # Variables de configuración
@@ -22,18 +24,6 @@ MARQUEE_MAX_WIDTH = 120 # Espacio disponible para el texto del menú (128 - 8 de
 marquee_direction = 1   # 1: izquierda, -1: derecha (ping-pong)
 
 
-def read_button(pin):
-    if pin.value() == 0:
-        utime.sleep_ms(20) # Pequeño debounce inicial
-        if pin.value() == 0:
-            start_time = utime.ticks_ms()
-            timeout = 100
-            while pin.value() == 0 and utime.ticks_diff(utime.ticks_ms(), start_time) < timeout:
-                utime.sleep_ms(10) 
-            return True
-            
-    return False
-
 # --- LÓGICA DE ACTUALIZACIÓN DE MARQUESINA CORREGIDA ---
 def update_marquee(item):
     """Actualiza el desplazamiento de la marquesina."""
@@ -78,6 +68,14 @@ def update_marquee(item):
     # Devolver el desplazamiento negativo para el dibujo (mover el texto hacia la izquierda)
     return -marquee_offset
 
+def marquee_wait_ms(item):
+    """ms hasta que update_marquee() vuelva a mover el texto, o None si no se desplaza."""
+    if len(item) * 8 - MARQUEE_MAX_WIDTH + 8 <= 0:
+        return None
+    wait = MARQUEE_DELAY_MS if marquee_offset == 0 and marquee_direction == 1 else MARQUEE_SPEED_MS + 1
+    due = utime.ticks_add(last_marquee_time, wait)
+    return max(0, utime.ticks_diff(due, utime.ticks_ms()))
+
 
 # --- Funciones Auxiliares de Dibujo ---
 
@@ -100,9 +98,8 @@ def draw_file_list(oled, files, current_index, height):
             x_pos = 0
             
             if i == current_index:
-                # 🚨 Aplicar marquesina SOLO al elemento seleccionado 🚨
-                x_offset = update_marquee(name)
-                x_pos += x_offset
+                # 🚨 Marquesina SOLO en el elemento seleccionado (la avanza run()) 🚨
+                x_pos -= marquee_offset
                 
                 oled.fill_rect(0, line * 10 - 1, 128, 9, 1) # Fondo blanco
                 color = 0 # Texto negro
@@ -119,8 +116,8 @@ def draw_file_list(oled, files, current_index, height):
 def draw_options_menu(oled, selected_file, options, current_index):
     """Dibuja el menú de opciones para el archivo seleccionado."""
     
-    # 🚨 Aplicar marquesina al nombre del archivo en la cabecera del menú de opciones 🚨
-    x_offset = update_marquee(selected_file)
+    # 🚨 Marquesina en el nombre del archivo de la cabecera (la avanza run()) 🚨
+    x_offset = -marquee_offset
     
     # Dibujar nombre del archivo (con marquesina)
     oled.fill_rect(0, 0, 128, 8, 0) # Limpiar área de cabecera
@@ -151,6 +148,11 @@ def handle_option_selection(oled, files, file_index, options, option_index,  ROM
         try:
             full_path = f"{ROMS_PATH}/{selected_file}"
             uos.remove(full_path)
+            imagen.remove_cache(full_path)
+            try:
+                uos.remove(imagen.eeprom_path(full_path)) # Su .eep, si lo tiene
+            except OSError:
+                pass
             oled.fill(0)
             oled.text(f"Borrado: {selected_file}", 0, 0)
             oled.show()
@@ -210,7 +212,7 @@ def run(oled, up_btn, down_btn, select_btn, back_btn, OLED_WIDTH, OLED_HEIGHT, u
     # --- Inicialización y Carga de Archivos ---
     files = []
     try:
-        files = [f[0] for f in uos.ilistdir(ROMS_PATH) ]
+        files = [f[0] for f in uos.ilistdir(ROMS_PATH) if not f[0].endswith(imagen.EEPROM_EXT)]
     except OSError:
         try: uos.mkdir(ROMS_PATH)
         except: pass
@@ -227,9 +229,7 @@ def run(oled, up_btn, down_btn, select_btn, back_btn, OLED_WIDTH, OLED_HEIGHT, u
     option_mode = False  # False: Selección de archivo; True: Selección de opción
     current_option_index = 0
     
-    SELECT_BTN_PIN = select_btn 
-    UP_BTN_PIN = up_btn
-    DOWN_BTN_PIN = down_btn
+    botones = entrada.servicio
 
     # Reiniciar el estado de la marquesina al iniciar el módulo
     global marquee_offset, last_marquee_time, marquee_direction
@@ -237,22 +237,35 @@ def run(oled, up_btn, down_btn, select_btn, back_btn, OLED_WIDTH, OLED_HEIGHT, u
     marquee_direction = 1
     last_marquee_time = utime.ticks_ms()
     
+    # Solo se repinta cuando cambia la vista: un botón o un paso de la marquesina
+    dirty = True
+    
     try:
         while True:
-            # 1. Dibujar la Pantalla
-            oled.fill(0)
+            # 1. Avanzar la marquesina del nombre seleccionado y dibujar si algo ha cambiado
+            offset = marquee_offset
+            update_marquee(files[current_file_index])
+            if marquee_offset != offset:
+                dirty = True
             
-            if not option_mode:
-                draw_file_list(oled, files, current_file_index, OLED_HEIGHT)
-            else:
-                draw_options_menu(oled, files[current_file_index], MENU_ITEMS, current_option_index)
+            if dirty:
+                oled.fill(0)
                 
-            oled.show()
+                if not option_mode:
+                    draw_file_list(oled, files, current_file_index, OLED_HEIGHT)
+                else:
+                    draw_options_menu(oled, files[current_file_index], MENU_ITEMS, current_option_index)
+                    
+                oled.show()
+                dirty = False
             
-            # 2. Manejar la Entrada de Botones (navegación y selección)
+            # 2. Esperar a la siguiente pulsación o al siguiente paso de la marquesina
+            ev = botones.espera(marquee_wait_ms(files[current_file_index]))
+            # Cualquier botón cambia la vista
+            dirty = ev is not None
             
             # Botón BACK: Salir/Atrás de forma inmediata
-            if read_button(back_btn):
+            if entrada.es(ev, entrada.BACK):
                 if option_mode:
                     # Si estás en el menú de opciones, vuelve a la lista
                     option_mode = False
@@ -264,8 +277,8 @@ def run(oled, up_btn, down_btn, select_btn, back_btn, OLED_WIDTH, OLED_HEIGHT, u
                     # Si estás en la lista, sal al menú principal
                     break # Sale del bucle, dispara KeyboardInterrupt
 
-            # Botón UP
-            elif read_button(UP_BTN_PIN):
+            # Botón UP (manteniendo pulsado, se repite)
+            elif entrada.es(ev, entrada.UP, (entrada.PULSA, entrada.REPITE)):
                 # Reiniciar marquesina al cambiar de selección
                 marquee_offset = 0
                 marquee_direction = 1
@@ -277,7 +290,7 @@ def run(oled, up_btn, down_btn, select_btn, back_btn, OLED_WIDTH, OLED_HEIGHT, u
                     current_option_index = (current_option_index - 1) % len(MENU_ITEMS)
                     
             # Botón DOWN
-            elif read_button(DOWN_BTN_PIN):
+            elif entrada.es(ev, entrada.DOWN, (entrada.PULSA, entrada.REPITE)):
                 # Reiniciar marquesina al cambiar de selección
                 marquee_offset = 0
                 marquee_direction = 1
@@ -289,7 +302,7 @@ def run(oled, up_btn, down_btn, select_btn, back_btn, OLED_WIDTH, OLED_HEIGHT, u
                     current_option_index = (current_option_index + 1) % len(MENU_ITEMS)
                     
             # Botón SELECT
-            elif read_button(SELECT_BTN_PIN): 
+            elif entrada.es(ev, entrada.SELECT): 
                 
                 if not option_mode:
                     # Modo Archivo: Entrar al menú de opciones
@@ -307,7 +320,7 @@ def run(oled, up_btn, down_btn, select_btn, back_btn, OLED_WIDTH, OLED_HEIGHT, u
                     )
                     
                     if action == "BORRAR":
-                        files = [f[0] for f in uos.ilistdir(ROMS_PATH)]
+                        files = [f[0] for f in uos.ilistdir(ROMS_PATH) if not f[0].endswith(imagen.EEPROM_EXT)]
                         if not files:
                             raise KeyboardInterrupt
                         current_file_index = min(current_file_index, len(files) - 1)
@@ -318,10 +331,6 @@ def run(oled, up_btn, down_btn, select_btn, back_btn, OLED_WIDTH, OLED_HEIGHT, u
                         marquee_offset = 0
                         marquee_direction = 1
                         last_marquee_time = utime.ticks_ms()
-                        
-            else:
-                # Si no hay interacción, un pequeño sleep para no saturar el CPU
-                utime.sleep_ms(10)
                 
     except KeyboardInterrupt:
         # Re-lanzar para salir correctamente al main.py
@@ -0,0 +1,89 @@
+# Log con niveles para los bucles del grabador.
+#
+# Los mensajes no salen por el REPL al momento: se guardan en un buffer
+# circular en RAM y se vuelcan con flush() al acabar el trabajo, o en cuanto
+# llega un error. Así los bucles de páginas no pagan la UART en cada vuelta.
+#
+# Un nivel desactivado no formatea nada: el mensaje se pasa como formato con
+# % y argumentos, y solo se compone si el nivel está activo. En los bucles
+# calientes la comprobación se saca fuera para no construir ni los argumentos:
+#
+#   debug = log.enabled(log.DEBUG)
+#   for page in pages:
+#       if debug:
+#           log.debug("page 0x%04X", addr)
+#
+# El nivel y el tamaño del buffer van en app/config.json:
+#   {"log": {"level": "debug" | "info" | "warning" | "error", "size": 64}}
+
+import app.cfg as cfg
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+NIVELES = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+
+_opciones = cfg.carga_config().get("log", {})
+level = NIVELES.get(_opciones.get("level", "info"), INFO)
+SIZE = _opciones.get("size", 64)
+
+_buf = [None] * SIZE
+_next = 0     # Posición donde irá el siguiente mensaje
+_count = 0    # Mensajes guardados (como mucho SIZE)
+_lost = 0     # Mensajes pisados antes del último flush()
+
+
+def set_level(nivel):
+    global level
+    level = NIVELES.get(nivel, nivel) if isinstance(nivel, str) else nivel
+
+
+def enabled(nivel):
+    return nivel >= level
+
+
+def _put(msg):
+    global _next, _count, _lost
+    if _count == SIZE:
+        _lost += 1
+    else:
+        _count += 1
+    _buf[_next] = msg
+    _next = (_next + 1) % SIZE
+
+
+def debug(msg, *args):
+    if level <= DEBUG:
+        _put(msg % args if args else msg)
+
+
+def info(msg, *args):
+    if level <= INFO:
+        _put(msg % args if args else msg)
+
+
+def warning(msg, *args):
+    if level <= WARNING:
+        _put(msg % args if args else msg)
+
+
+def error(msg, *args):
+    """Los errores se guardan y además vuelcan el buffer en el momento."""
+    if level <= ERROR:
+        _put(msg % args if args else msg)
+        flush()
+
+
+def flush():
+    """Imprime los mensajes guardados, en orden, y vacía el buffer."""
+    global _count, _lost
+    if _lost:
+        print(f"... {_lost} earlier log messages lost")
+    first = (_next - _count) % SIZE
+    for k in range(_count):
+        i = (first + k) % SIZE
+        print(_buf[i])
+        _buf[i] = None
+    _count = 0
+    _lost = 0
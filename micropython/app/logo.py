@@ -1,4 +1,5 @@
 import framebuf, utime
+from app.graficos import Bitmap
 
 FONT_4X6_DATA = bytearray([
     4, # 0: Ancho de los caracteres (W)
@@ -49,71 +50,45 @@ def run(oled):
 █▄█ █▀▄  █   █  █▀▀ █▀▄
 ▀ ▀ ▀ ▀ ▀▀▀  ▀  ▀▀▀ ▀ ▀"""
     
+    # Cada línea se convierte una sola vez en un Bitmap; la animación son blits
+    lineas1 = [renderiza(a) for a in string1.splitlines()[1:]]
+    lineas2 = [renderiza(a) for a in string2.splitlines()[1:]]
     for i in range(4):
-        x,y = 6,17
-        for a in string1.splitlines()[1:]:
-            draw_text_custom(oled, a, x, y)
-            y += 6
-        x,y = 6,17
-        for a in string2.splitlines()[1:]:
-            draw_text_custom(oled, a, x, y)
-            y += 6
+        for lineas in (lineas1, lineas2):
+            x,y = 6,17
+            for bmp in lineas:
+                oled.blit(bmp, x, y)
+                oled.show()
+                y += 6
 
     utime.sleep_ms(2000)
 
+def renderiza(text):
+    """
+    Devuelve un Bitmap con la cadena en la fuente personalizada. Cada glifo se
+    guarda por columnas con el bit 0 arriba, que es justo el formato MONO_VLSB:
+    las columnas se copian tal cual al buffer.
+    """
+    paso = FONT_WIDTH + 1
+    bmp = Bitmap(len(text) * paso, FONT_HEIGHT)
+    buf = bmp.buffer
+    for k, char in enumerate(text):
+        glyph_map_index = CHAR_MAP.get(ord(char))
+        if glyph_map_index is None:
+            continue # Carácter sin glifo: queda en blanco
+        data_start = glyph_map_index * BYTES_PER_GLYPH + HEADER_SIZE
+        buf[k * paso:k * paso + FONT_WIDTH] = FONT_4X6_DATA[data_start:data_start + FONT_WIDTH]
+    return bmp
+
 def draw_text_custom(display, text, start_x, start_y):
     """
     Imprime una cadena en la pantalla usando la fuente de mapa de bits personalizada,
-    borrando el área del glifo antes de dibujarlo.
+    borrando el área de cada glifo (el blit también copia los píxeles apagados).
     
     :param display: Objeto de visualización (ej: SSD1306)
     :param text: La cadena a imprimir (ej: "░█▀█...")
     :param start_x: Coordenada X inicial
     :param start_y: Coordenada Y inicial
     """
-    current_x = start_x
-    
-    for char in text:
-        char_code = ord(char)
-        
-        # 1. Borrar el área del glifo actual (incluyendo el espacio de separación)
-        # Borra un rectángulo de (FONT_WIDTH + 1) de ancho y FONT_HEIGHT de alto.
-        # Esto asegura que el área del glifo y el píxel de separación a la derecha se limpien.
-        try:
-            display.fill_rect(current_x, start_y, FONT_WIDTH + 1, FONT_HEIGHT, 0)
-        except AttributeError:
-            # Manejar el caso si 'fill_rect' no existe (ej. si solo existe 'fill')
-            pass
-        
-        # Comprobar si el carácter está mapeado (si es un glifo real)
-        if char_code not in CHAR_MAP:
-            # Si el carácter no está en la fuente, simplemente avanza
-            current_x += FONT_WIDTH + 1
-            continue
-
-        # 2. Calcular la posición de inicio del glifo en FONT_4X6_DATA
-        # Nota: Asume que FONT_WIDTH, FONT_HEIGHT, CHAR_MAP, etc., están definidos globalmente.
-        glyph_map_index = CHAR_MAP[char_code]
-        data_start = glyph_map_index * BYTES_PER_GLYPH + HEADER_SIZE
-        
-        # 3. Recorrer y pintar las 4 columnas del glifo
-        for col in range(FONT_WIDTH):
-            if current_x + col >= 128:
-                break # Salir si está fuera del límite X
-                
-            # Obtiene el byte de la columna (que tiene 6 bits de datos de píxel)
-            col_byte = FONT_4X6_DATA[data_start + col]
-            
-            # Recorre los 6 píxeles de la columna
-            for row in range(FONT_HEIGHT):
-                if start_y + row >= 64:
-                    break # Salir si está fuera del límite Y
-                    
-                # El píxel se pinta (color 1) si el bit 'row' está en 1
-                if (col_byte >> row) & 0x01:
-                    display.pixel(current_x + col, start_y + row, 1)
-        
-        # 4. Mover la posición X para el siguiente carácter
-        current_x += FONT_WIDTH + 1 
-        
-    display.show() # Actualiza la pantalla para mostrar los cambios
\ No newline at end of file
+    display.blit(renderiza(text), start_x, start_y)
+    display.show() # Actualiza la pantalla para mostrar los cambios
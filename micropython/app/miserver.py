@@ -10,6 +10,9 @@ import uasyncio as asyncio
 import ure as re
 import gc
 import app.cfg as cfg
+import app.imagen as imagen
+import app.progreso as progreso
+import app.entrada as entrada
 
 localip =""
 roms_files = os.listdir("/roms")
@@ -210,6 +213,12 @@ async def handler(path, method, reader, headers):
 
             if total_read == bytes_to_read_file_data:
                 print(f"✅ Archivo guardado correctamente ({total_read} bytes)")
+                # Pre-decodificar la ROM: grabar será solo leer la caché binaria
+                try:
+                    if not filepath.endswith(imagen.EEPROM_EXT) and not imagen.is_dump(filepath):
+                        imagen.build_cache(filepath)
+                except (OSError, ValueError) as e:
+                    print(f"No se pudo generar la caché de {filepath}: {e}")
                 return "ok"
             else:
                 print(f"❌ Subida incompleta. Recibidos: {total_read} de {bytes_to_read_file_data} bytes.")
@@ -230,8 +239,12 @@ async def handler(path, method, reader, headers):
         await guarda_info(form)
         return "redirect /reset"
     
+    # --- Estado final del último trabajo de grabación/lectura (la web lo pide al cargar) ---
+    if path == '/progreso' and method == 'GET':
+        return json.dumps(progreso.actual.estado())
+
     # --- Manejador de archivos estáticos (GET) ---
-    modo = 'rb' if path.endswith((".jpg", ".jpeg", ".png", ".ico", ".svg",".hex")) else 'r'
+    modo = 'rb' if path.endswith((".jpg", ".jpeg", ".png", ".ico", ".svg",".hex",".bin",".binz")) else 'r'
     file_path = path[1:]
     if not file_path:
         file_path = "web/index.html" # Ruta por defecto
@@ -260,7 +273,7 @@ async def watchdog_task(back_btn):
     print("Iniciando vigilancia de botón...")
     while True:
         # Verifica la condición de parada
-        if back_btn.value() == 0:
+        if entrada.es(entrada.servicio.evento(), entrada.BACK):
             print("\n🚨 Botón de parada detectado. Deteniendo tareas.")
             # Forzar la salida de asyncio.run() levantando KeyboardInterrupt
             # Es el mecanismo más limpio para detener el bucle principal en uasyncio.
@@ -0,0 +1,65 @@
+# Progreso del trabajo en curso (grabar, verificar, leer).
+#
+# El motor ISP solo actualiza contadores enteros con avanza(); la barra de la
+# pantalla se repinta entre páginas únicamente cuando ha pasado el intervalo
+# desde el último dibujo, y termina() fuerza el fotograma del 100%. Así el
+# tiempo de grabación no depende de lo que tarde el OLED.
+#
+# El mismo objeto guarda el estado del último trabajo para la web (/progreso).
+
+import utime
+from app.comun import pinta_barra
+
+INTERVALO_MS = 250
+
+
+class Progreso:
+    def __init__(self, intervalo_ms=INTERVALO_MS):
+        self.intervalo_ms = intervalo_ms
+        self.oled = None
+        self.fase = ""
+        self.graba = False
+        self.hecho = 0
+        self.total = 0
+        self.resultado = None    # "programmed", "up to date", "failed"... al acabar
+        self._proximo = 0        # ticks_ms a partir del cual se puede repintar
+        self._pintado = -1       # Último porcentaje dibujado
+
+    def empieza(self, oled, fase, total, graba=False):
+        """Nueva fase de total pasos; dibuja el 0% (marco y rótulo de la barra)."""
+        self.oled = oled
+        self.fase = fase
+        self.graba = graba
+        self.total = total
+        self.hecho = 0
+        self.resultado = None
+        self._pintado = -1
+        self.pinta()
+
+    def avanza(self, n=1):
+        self.hecho += n
+        if utime.ticks_diff(utime.ticks_ms(), self._proximo) >= 0:
+            self.pinta()
+
+    def termina(self, resultado=None):
+        self.hecho = self.total
+        if resultado is not None:
+            self.resultado = resultado
+        self.pinta()
+
+    def porcentaje(self):
+        return self.hecho * 100 // self.total if self.total else 100
+
+    def pinta(self):
+        p = self.porcentaje()
+        if self.oled is not None and p != self._pintado:
+            pinta_barra(self.oled, p, self.fase, self.graba)
+            self._pintado = p
+        self._proximo = utime.ticks_add(utime.ticks_ms(), self.intervalo_ms)
+
+    def estado(self):
+        return {"fase": self.fase.strip(), "hecho": self.hecho, "total": self.total,
+                "porcentaje": self.porcentaje(), "resultado": self.resultado}
+
+
+actual = Progreso()
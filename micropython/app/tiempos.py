@@ -0,0 +1,163 @@
+# Medida de tiempos por fase de un trabajo de grabación.
+#
+# Cada fase (entrar en modo programación, firma, fuses, borrado, cada página,
+# verificación, EEPROM, refrescos de pantalla) acumula cuenta, total, mínimo y
+# máximo en microsegundos. Los acumuladores son arrays preasignados: medir un
+# tramo no reserva memoria, así que se puede usar dentro del bucle de páginas.
+#
+#   t = tiempos.inicio()
+#   ...
+#   tiempos.fin(tiempos.PAGE, t)
+#
+# En modo producción se abre una sesión (sesion(True)): cada trabajo se suma
+# al acabar y el resumen de la sesión (resumen_sesion()) se guarda una vez.
+
+import utime
+import uos
+from array import array
+
+START = 0
+SIGNATURE = 1
+FUSES = 2
+ERASE = 3
+PAGE = 4
+VERIFY = 5
+EEPROM = 6
+DISPLAY = 7
+NOMBRES = ("start", "signature", "fuses", "erase", "page", "verify", "eeprom", "display")
+FASES = len(NOMBRES)
+
+LOG_PATH = "/tiempos.log"
+LOG_MAX = 8192  # Bytes: al pasar de ahí el log se rota a LOG_PATH + ".old"
+
+_count = array('l', [0] * FASES)
+_total = array('l', [0] * FASES)
+_min = array('l', [0] * FASES)
+_max = array('l', [0] * FASES)
+_job = array('l', [0, 0])  # ticks_us al empezar el trabajo, duración total
+
+# Sesión: cada trabajo se suma al acabar en listas de enteros de Python, que
+# no tienen tope (en 32 bits los µs de una sesión larga desbordarían en ~36 min)
+_sesion = False
+_ses_count = [0] * FASES
+_ses_total = [0] * FASES
+_ses_min = [0] * FASES
+_ses_max = [0] * FASES
+_ses_job = [0, 0]  # Trabajos, duración total en µs
+
+
+def sesion(activa):
+    """Con activa, los trabajos siguientes se acumulan hasta sesion(False)."""
+    global _sesion
+    _sesion = activa
+    if activa:
+        for f in range(FASES):
+            _ses_count[f] = 0
+            _ses_total[f] = 0
+            _ses_min[f] = 0
+            _ses_max[f] = 0
+        _ses_job[0] = 0
+        _ses_job[1] = 0
+
+
+def empieza():
+    """Pone a cero los acumuladores al empezar un trabajo."""
+    for f in range(FASES):
+        _count[f] = 0
+        _total[f] = 0
+        _min[f] = 0
+        _max[f] = 0
+    _job[0] = utime.ticks_us()
+    _job[1] = 0
+
+
+def termina():
+    _job[1] = utime.ticks_diff(utime.ticks_us(), _job[0])
+    if _sesion:
+        for f in range(FASES):
+            n = _count[f]
+            if n:
+                if _ses_count[f] == 0 or _min[f] < _ses_min[f]:
+                    _ses_min[f] = _min[f]
+                if _max[f] > _ses_max[f]:
+                    _ses_max[f] = _max[f]
+                _ses_count[f] += n
+                _ses_total[f] += _total[f]
+        _ses_job[0] += 1
+        _ses_job[1] += _job[1]
+
+
+def inicio():
+    return utime.ticks_us()
+
+
+def fin(fase, t):
+    """Cierra el tramo de fase que empezó en t (valor de inicio())."""
+    us = utime.ticks_diff(utime.ticks_us(), t)
+    if _count[fase] == 0 or us < _min[fase]:
+        _min[fase] = us
+    if us > _max[fase]:
+        _max[fase] = us
+    _count[fase] += 1
+    _total[fase] += us
+
+
+def total_ms():
+    return _job[1] // 1000
+
+
+def resumen():
+    """Líneas de texto con los acumuladores de cada fase del último trabajo."""
+    lineas = [f"job: {_job[1] // 1000}ms"]
+    for f in range(FASES):
+        n = _count[f]
+        if n:
+            lineas.append(f"{NOMBRES[f]}: n={n} total={_total[f]}us "
+                          f"avg={_total[f] // n}us min={_min[f]}us max={_max[f]}us")
+    return lineas
+
+
+def resumen_sesion():
+    """Como resumen(), con lo acumulado en la sesión; los totales en ms."""
+    jobs = _ses_job[0]
+    lineas = [f"jobs: {jobs} total={_ses_job[1] // 1000}ms avg={_ses_job[1] // max(1, jobs) // 1000}ms"]
+    for f in range(FASES):
+        n = _ses_count[f]
+        if n:
+            lineas.append(f"{NOMBRES[f]}: n={n} total={_ses_total[f] // 1000}ms "
+                          f"avg={_ses_total[f] // n}us min={_ses_min[f]}us max={_ses_max[f]}us")
+    return lineas
+
+
+def muestra(oled):
+    """Resumen en pantalla: total del trabajo y las 5 fases que más tiempo llevan."""
+    oled.fill(0)
+    oled.text(f"Tiempo {total_ms()}ms"[:16], 0, 1, 1)
+    fases = sorted([f for f in range(FASES) if _count[f]], key=lambda f: -_total[f])
+    for k, f in enumerate(fases[:5]):
+        oled.text(f"{NOMBRES[f][:7]:<7}{_total[f] // 1000:>7}ms"[:16], 0, 12 + k * 9, 1)
+    oled.show()
+
+
+def guarda(rom="", path=LOG_PATH, lineas=None):
+    """
+    Añade al log de tiempos el resumen del último trabajo, o las lineas dadas
+    (p. ej. resumen_sesion()). Si el log pasa de LOG_MAX se rota antes, para
+    no llenar la flash.
+    """
+    try:
+        if uos.stat(path)[6] > LOG_MAX:
+            try:
+                uos.remove(path + ".old")
+            except OSError:
+                pass
+            uos.rename(path, path + ".old")
+    except OSError:
+        pass
+    try:
+        with open(path, "a") as f:
+            f.write(f"--- {rom}\n")
+            for linea in lineas or resumen():
+                f.write(linea + "\n")
+    except OSError as e:
+        print(f"Could not write {path}: {e}")
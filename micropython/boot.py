@@ -8,6 +8,7 @@ import random
 import math
 import sys # Importante para liberar módulos
 import app.cfg as cfg
+import app.entrada as entrada
 
 # --- CONFIGURACIÓN DE PINES Y PERIFÉRICOS ---
 I2C_SDA = 8 # 5
@@ -59,6 +60,12 @@ MARQUEE_SPEED_MS = 100 # Tiempo entre cada desplazamiento de 1 pixel
 MARQUEE_MAX_WIDTH = OLED_WIDTH - 20 # Espacio disponible para el texto del menú (aprox)
 marquee_direction = 1 # 1: izquierda, -1: derecha (ping-pong)
 
+# --- REPINTADO ---
+# El menú solo se redibuja cuando algo cambia (botón, paso de marquesina o
+# vuelta de un módulo); entre cambios el bucle espera en la cola de botones
+# hasta el siguiente paso de la marquesina
+menu_dirty = True
+
 
 
 # --- INICIALIZACIÓN DE I2C Y PANTALLA ---
@@ -91,26 +98,18 @@ up_btn = machine.Pin(PIN_UP, machine.Pin.IN, machine.Pin.PULL_UP)
 down_btn = machine.Pin(PIN_DOWN, machine.Pin.IN, machine.Pin.PULL_UP)
 select_btn = machine.Pin(PIN_SELECT, machine.Pin.IN, machine.Pin.PULL_UP)
 back_btn = machine.Pin(PIN_BACK, machine.Pin.IN, machine.Pin.PULL_UP)
-last_press_time = 0
-debounce_delay = 200
+# Los botones van por interrupción (app/entrada.py); los módulos leen la misma cola
+botones = entrada.inicia(up_btn, down_btn, select_btn, back_btn)
 
 # --- MANEJO DE ENTRADA Y NAVEGACIÓN ---
-def read_button(pin):
-    global last_press_time
-    current_time = utime.ticks_ms()
-    if pin.value() == 0 and utime.ticks_diff(current_time, last_press_time) > debounce_delay:
-        last_press_time = current_time
-        return True
-    return False
-
-def handle_menu_input():
-    global menu_index, menu_top_item, current_state, marquee_offset, last_marquee_time, marquee_direction
+def handle_menu_input(ev):
+    global menu_index, menu_top_item, current_state, marquee_offset, last_marquee_time, marquee_direction, menu_dirty
     
     # Reiniciar la marquesina al cambiar de elemento
     input_received = False
     
-    # Navegación hacia arriba
-    if read_button(up_btn):
+    # Navegación hacia arriba (manteniendo pulsado, se repite)
+    if entrada.es(ev, entrada.UP, (entrada.PULSA, entrada.REPITE)):
         # Manejo del índice con wrap-around (vuelve al final si está en 0)
         menu_index = (menu_index - 1)
         if menu_index < 0:
@@ -124,10 +123,9 @@ def handle_menu_input():
             if menu_top_item < 0: menu_top_item = 0 # Asegura que no sea negativo
             
         input_received = True
-        utime.sleep_ms(100)
         
     # Navegación hacia abajo
-    elif read_button(down_btn):
+    elif entrada.es(ev, entrada.DOWN, (entrada.PULSA, entrada.REPITE)):
         # Manejo del índice con wrap-around (vuelve a 0 si está en el final)
         menu_index = (menu_index + 1) % len(menu_items)
         
@@ -138,20 +136,27 @@ def handle_menu_input():
             menu_top_item = 0
             
         input_received = True
-        utime.sleep_ms(100)
         
     # Selección
-    elif read_button(select_btn):
+    elif entrada.es(ev, entrada.SELECT):
         current_state = menu_index + 1
         input_received = True
-        utime.sleep_ms(200)
 
     # Si se detecta cualquier entrada, reiniciar el estado de la marquesina
     if input_received:
+        menu_dirty = True
         marquee_offset = 0
         marquee_direction = 1 # Restablecer dirección a izquierda (inicio)
         last_marquee_time = utime.ticks_ms()
         #print(f"Index: {menu_index}, Top: {menu_top_item}, Items: {len(menu_items)}")
+    return input_received
+
+def marquee_wait_ms(current_time):
+    """ms hasta el próximo paso de la marquesina, o None si el elemento no se desplaza."""
+    if len(menu_items[menu_index]) * 8 - MARQUEE_MAX_WIDTH + 8 <= 0:
+        return None
+    due = utime.ticks_add(last_marquee_time, max(MARQUEE_DELAY_MS, MARQUEE_DELAY_MS + MARQUEE_SPEED_MS - 100) + 1)
+    return max(0, utime.ticks_diff(due, current_time))
         
 def draw_menu():
     oled.fill(0)
@@ -219,6 +224,7 @@ if oled:
                     # Aplicar desplazamiento en la dirección actual
                     marquee_offset += marquee_direction
                     last_marquee_time = current_time 
+                    menu_dirty = True
                     
                     # Lógica para invertir la dirección (Efecto Ping-Pong)
                     if marquee_offset >= max_scroll:
@@ -233,8 +239,11 @@ if oled:
                         # Espera extra en el límite inicial para que se pueda leer
                         last_marquee_time = current_time + 1000
             
-            draw_menu()
-            handle_menu_input()
+            if menu_dirty:
+                draw_menu()
+                menu_dirty = False
+            # Esperar a la siguiente pulsación o al siguiente paso de la marquesina
+            handle_menu_input(botones.espera(marquee_wait_ms(utime.ticks_ms())))
         
         elif current_state > STATE_MENU:
             # --- LÓGICA DE CARGA PEREZOSA (LAZY LOADING) ---
@@ -296,6 +305,7 @@ if oled:
                 print(f"RAM libre después de GC: {gc.mem_free()}")
                 
                 current_state = STATE_MENU
+                menu_dirty = True # La pantalla y los elementos del menú han podido cambiar
                 marquee_offset = 0 # Reiniciar la marquesina al volver al menú
                 marquee_direction = 1 # Reiniciar la dirección
                 last_marquee_time = utime.ticks_ms()
@@ -27,6 +27,12 @@ SET_CHARGE_PUMP = const(0x8D)
 
 # Subclassing FrameBuffer provides support for graphics primitives
 # http://docs.micropython.org/en/latest/pyboard/library/framebuf.html
+#
+# The drawing primitives are wrapped to record, per 8-row page, the span of
+# columns that changed since the last show(). show() then sends only those
+# spans (a SET_COL_ADDR/SET_PAGE_ADDR window per dirty page) instead of the
+# whole frame. Code that writes to self.buffer directly must call mark() or
+# show(full=True).
 class SSD1306(framebuf.FrameBuffer):
     def __init__(self, width, height, external_vcc):
         self.width = width
@@ -34,9 +40,89 @@ class SSD1306(framebuf.FrameBuffer):
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        self.dirty_x0 = bytearray(self.pages)  # first dirty column per page
+        self.dirty_x1 = bytearray(self.pages)  # last dirty column + 1 (0: clean)
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
         self.init_display()
 
+    def mark(self, x, y, w, h):
+        """Flag the rectangle as changed so the next show() sends it."""
+        if x < 0:
+            w += x
+            x = 0
+        if y < 0:
+            h += y
+            y = 0
+        if x + w > self.width:
+            w = self.width - x
+        if y + h > self.height:
+            h = self.height - y
+        if w <= 0 or h <= 0:
+            return
+        x1 = x + w
+        x0s = self.dirty_x0
+        x1s = self.dirty_x1
+        for p in range(y >> 3, ((y + h - 1) >> 3) + 1):
+            if not x1s[p]:
+                x0s[p] = x
+                x1s[p] = x1
+            else:
+                if x < x0s[p]:
+                    x0s[p] = x
+                if x1 > x1s[p]:
+                    x1s[p] = x1
+
+    def mark_all(self):
+        for p in range(self.pages):
+            self.dirty_x0[p] = 0
+            self.dirty_x1[p] = self.width
+
+    def fill(self, c):
+        super().fill(c)
+        self.mark_all()
+
+    def fill_rect(self, x, y, w, h, c):
+        super().fill_rect(x, y, w, h, c)
+        self.mark(x, y, w, h)
+
+    def rect(self, x, y, w, h, c, *args):
+        super().rect(x, y, w, h, c, *args)
+        self.mark(x, y, w, h)
+
+    def pixel(self, x, y, c=None):
+        if c is None:
+            return super().pixel(x, y)
+        super().pixel(x, y, c)
+        self.mark(x, y, 1, 1)
+
+    def hline(self, x, y, w, c):
+        super().hline(x, y, w, c)
+        self.mark(x, y, w, 1)
+
+    def vline(self, x, y, h, c):
+        super().vline(x, y, h, c)
+        self.mark(x, y, 1, h)
+
+    def line(self, x1, y1, x2, y2, c):
+        super().line(x1, y1, x2, y2, c)
+        self.mark(min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1)
+
+    def text(self, s, x, y, c=1):
+        super().text(s, x, y, c)
+        self.mark(x, y, 8 * len(s), 8)
+
+    def blit(self, fbuf, x, y, *args):
+        super().blit(fbuf, x, y, *args)
+        # Plain FrameBuffers don't expose their size: mark everything
+        if hasattr(fbuf, "width") and hasattr(fbuf, "height"):
+            self.mark(x, y, fbuf.width, fbuf.height)
+        else:
+            self.mark_all()
+
+    def scroll(self, xstep, ystep):
+        super().scroll(xstep, ystep)
+        self.mark_all()
+
     def init_display(self):
         for cmd in (
             SET_DISP,  # display off
@@ -93,21 +179,37 @@ class SSD1306(framebuf.FrameBuffer):
         self.write_cmd(SET_COM_OUT_DIR | ((rotate & 1) << 3))
         self.write_cmd(SET_SEG_REMAP | (rotate & 1))
 
-    def show(self):
-        x0 = 0
-        x1 = self.width - 1
-        if self.width != 128:
-            # narrow displays use centred columns
-            col_offset = (128 - self.width) // 2
-            x0 += col_offset
-            x1 += col_offset
+    def show(self, full=False):
+        # narrow displays use centred columns
+        col_offset = (128 - self.width) // 2
+        x0s = self.dirty_x0
+        x1s = self.dirty_x1
+        if not full:
+            full = True
+            for p in range(self.pages):
+                if x0s[p] or x1s[p] != self.width:
+                    full = False
+                    break
+        if full:
+            self._window(col_offset, col_offset + self.width - 1, 0, self.pages - 1)
+            self.write_data(self.buffer)
+        else:
+            mv = memoryview(self.buffer)
+            for p in range(self.pages):
+                if x1s[p]:
+                    self._window(col_offset + x0s[p], col_offset + x1s[p] - 1, p, p)
+                    start = p * self.width
+                    self.write_data(mv[start + x0s[p]:start + x1s[p]])
+        for p in range(self.pages):
+            x1s[p] = 0
+
+    def _window(self, x0, x1, p0, p1):
         self.write_cmd(SET_COL_ADDR)
         self.write_cmd(x0)
         self.write_cmd(x1)
         self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        self.write_cmd(p0)
+        self.write_cmd(p1)
 
 
 class SSD1306_I2C(SSD1306):
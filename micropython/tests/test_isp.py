@@ -0,0 +1,118 @@
+# Pruebas del motor ISP (IspPort) contra el ATtiny simulado de app/isp.py.
+#
+# No necesitan chip ni zócalo: se ejecutan en la placa con el árbol montado,
+# desde el directorio micropython/:
+#   mpremote mount . run tests/test_isp.py
+
+import app.isp as isp
+import app.attiny as attiny
+from app.attiny import IspPort
+
+
+class _Transporte(isp.FakeTransport):
+    """FakeTransport en el que los zócalos de vacios no tienen chip (MISO en alto)."""
+
+    def __init__(self, targets, vacios=()):
+        super().__init__(targets)
+        self.vacios = vacios
+
+    def _transfer_one(self, target, tx, rx):
+        if target in self.vacios:
+            for i in range(len(tx)):
+                rx[i] = 0xFF
+            return
+        super()._transfer_one(target, tx, rx)
+
+
+def _puerto(targets, vacios=()):
+    transporte = _Transporte(targets, vacios)
+    return IspPort(transporte, transporte.targets)
+
+
+def _entra(port):
+    """start() sin negociar el SCK (no toca la caché de velocidades de config.json)."""
+    auto = attiny.AUTO_SPEED
+    attiny.AUTO_SPEED = False
+    try:
+        return port.start()
+    finally:
+        attiny.AUTO_SPEED = auto
+
+
+def _graba_pagina(port, addr, data):
+    if not port.load_page(data):
+        return False
+    port.cmd(0x4C, (addr >> 9) & 0xFF, (addr >> 1) & 0xFF, 0x00)
+    port.wait_ready("page", attiny.dispositivos.ATTINY13.t_flash)
+    return True
+
+
+PAGINA = bytes(range(0x10, 0x30))  # 32 bytes, una página del ATtiny13
+
+
+def test_graba_y_relee():
+    chip = isp.FakeTarget()
+    port = _puerto([chip])
+    assert _entra(port)
+    assert _graba_pagina(port, 0x40, PAGINA)
+    leido = bytearray(len(PAGINA))
+    port.read_block(0x40, len(PAGINA), [leido])
+    assert leido == PAGINA
+    assert chip.flash[0x40:0x60] == PAGINA
+    assert chip.flash[:0x40] == b"\xff" * 0x40
+    port.end()
+    assert chip.rst == 1 and not chip.enabled
+
+
+def test_sin_eco_en_programming_enable():
+    chip = isp.FakeTarget()
+    port = _puerto([chip], vacios=(chip,))
+    assert not _entra(port)
+    assert port.results == ["no chip"]
+    port.end()
+
+
+def test_eco_perdido_al_cargar_pagina():
+    chip = isp.FakeTarget()
+    port = _puerto([chip])
+    assert _entra(port)
+    chip.sync_lost = True  # Como tras un SCK demasiado rápido
+    assert not port.load_page(PAGINA)
+    assert port.results == ["page load"]
+    assert chip.rst == 0  # Fuera del modo programación pero aún en reset
+    port.end()
+    assert chip.rst == 1
+    assert chip.flash[:len(PAGINA)] == b"\xff" * len(PAGINA)
+
+
+def test_gang_descarta_zocalo_y_sigue():
+    chips = [isp.FakeTarget(), isp.FakeTarget(), isp.FakeTarget()]
+    port = _puerto(chips, vacios=(chips[2],))
+    assert _entra(port)
+    assert port.active_sockets() == [0, 1]
+    assert port.results[2] == "no chip"
+    chips[1].sync_lost = True
+    assert _graba_pagina(port, 0, PAGINA)
+    assert port.active_sockets() == [0]
+    assert port.results[1] == "page load"
+    # Los zócalos descartados siguen en reset mientras se graba el resto
+    assert chips[1].rst == 0 and chips[2].rst == 0
+    assert chips[0].flash[:len(PAGINA)] == PAGINA
+    assert chips[1].flash[:len(PAGINA)] == b"\xff" * len(PAGINA)
+    port.finish(0, "programmed")
+    port.end()
+    assert [c.rst for c in chips] == [1, 1, 1]
+    assert not port.all_ok()
+
+
+def run():
+    n = 0
+    for nombre, prueba in sorted(globals().items()):
+        if nombre.startswith("test_"):
+            prueba()
+            print(nombre, "OK")
+            n += 1
+    print(n, "tests OK")
+
+
+run()